@@ -0,0 +1,239 @@
+import argparse
+import json
+import os
+import threading
+import time
+import types
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from uuid import uuid4
+from dotenv import load_dotenv
+from firebase_config import db
+from batch_writer import chunked, MAX_BATCH_SIZE
+from data_version import get_data_version
+import financial_advice
+from financial_advice import generate_advice
+
+load_dotenv()
+
+# Regenerates advice ahead of time for users whose data changed since it was last checked.
+#   python advice_precompute.py [--workers N] [--rpm N] [--every MINUTES] [--stub-model] [uid ...]
+# With FIRESTORE_EMULATOR_HOST set it runs against the emulator; --stub-model skips Gemini.
+
+ADVICE_PRECOMPUTE_WORKERS = int(os.getenv("ADVICE_PRECOMPUTE_WORKERS", "4"))
+GEMINI_REQUESTS_PER_MINUTE = int(os.getenv("GEMINI_REQUESTS_PER_MINUTE", "60"))
+ADVICE_PRECOMPUTE_CHECKPOINT = os.getenv("ADVICE_PRECOMPUTE_CHECKPOINT", "advice_precompute_checkpoint.json")
+ADVICE_PRECOMPUTE_INTERVAL_MINUTES = int(os.getenv("ADVICE_PRECOMPUTE_INTERVAL_MINUTES", "0"))
+
+
+class RateLimiter:
+    """Spaces calls evenly so all threads together stay within requests_per_minute."""
+
+    def __init__(self, requests_per_minute: int):
+        self.interval = 60 / max(1, requests_per_minute)
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self.interval
+        time.sleep(max(0.0, slot - now))
+
+
+class BudgetedModel:
+    # Only real model calls spend budget; memoised advice never reaches here
+    def __init__(self, model, limiter: RateLimiter):
+        self.model = model
+        self.limiter = limiter
+
+    def generate_content(self, prompt, **kwargs):
+        self.limiter.acquire()
+        return self.model.generate_content(prompt, **kwargs)
+
+
+class StubAdviceModel:
+    """Canned Gemini stand-in for dry runs and emulator tests."""
+
+    def generate_content(self, prompt, **kwargs):
+        return types.SimpleNamespace(text=json.dumps({
+            "insights": [{"title": "Precomputed Advice", "description": "Generated by the stub model."}],
+            "monthly_health": {"financial_grade": "B", "savings_rate": 0, "potential_savings": 0, "areas_to_improve": []},
+        }))
+
+
+def advice_state_ref(uid: str):
+    return db.collection("users").document(uid).collection("ledger").document("advice")
+
+
+def find_stale_users(uids=None):
+    """(uid, data_version) for users whose data changed since their advice was last checked."""
+    users_ref = db.collection("users")
+    if uids:
+        snapshots = db.get_all([users_ref.document(uid) for uid in uids], field_paths=["data_version"])
+    else:
+        snapshots = users_ref.select(["data_version"]).stream()
+    versions = {s.id: (s.to_dict() or {}).get("data_version", 0) for s in snapshots if s.exists}
+    versions = {uid: v for uid, v in versions.items() if v}
+
+    checked = {}
+    for chunk in chunked(list(versions), MAX_BATCH_SIZE):
+        for doc in db.get_all([advice_state_ref(uid) for uid in chunk]):
+            if doc.exists:
+                checked[doc.reference.parent.parent.id] = doc.to_dict().get("checked_version", 0)
+
+    return sorted((uid, v) for uid, v in versions.items() if v > checked.get(uid, 0))
+
+
+def process_user(uid: str, generator) -> bool:
+    # Saving advice leaves data_version alone, so this is still the current version once
+    # the advice is saved; a write that lands mid-generation keeps the user stale, as it should
+    version = get_data_version(uid)
+    advice, cached = generate_advice(uid, generator=generator)
+    advice_state_ref(uid).set({
+        "checked_version": version,
+        "cached": cached,
+        "checked_at": datetime.utcnow().isoformat(),
+    })
+    return cached
+
+
+class RunCheckpoint:
+    """One run's work list and progress, rewritten atomically after every user."""
+
+    def __init__(self, path: str, state: dict):
+        self.path = path
+        self.state = state
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path: str):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return cls(path, json.load(f))
+        except (OSError, ValueError):
+            return None
+
+    @classmethod
+    def start(cls, path: str, users):
+        checkpoint = cls(path, {
+            "run_id": str(uuid4()),
+            "started_at": datetime.utcnow().isoformat(),
+            "finished_at": None,
+            "users": [[uid, version] for uid, version in users],
+            "generated": [],
+            "cached": [],
+            "failed": {},
+        })
+        checkpoint.save()
+        return checkpoint
+
+    @property
+    def finished(self) -> bool:
+        return self.state["finished_at"] is not None
+
+    def remaining(self):
+        handled = set(self.state["generated"]) | set(self.state["cached"])
+        return [(uid, version) for uid, version in self.state["users"] if uid not in handled]
+
+    def record(self, uid: str, cached: bool = None, error: str = None):
+        with self._lock:
+            if error is not None:
+                self.state["failed"][uid] = error
+            else:
+                self.state["failed"].pop(uid, None)
+                self.state["cached" if cached else "generated"].append(uid)
+            self.save()
+
+    def finish(self):
+        with self._lock:
+            self.state["finished_at"] = datetime.utcnow().isoformat()
+            self.save()
+
+    def save(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.state, f)
+        os.replace(tmp_path, self.path)
+
+    def summary(self) -> dict:
+        return {
+            "run_id": self.state["run_id"],
+            "users": len(self.state["users"]),
+            "generated": len(self.state["generated"]),
+            "unchanged": len(self.state["cached"]),
+            "failed": len(self.state["failed"]),
+        }
+
+
+def run_precompute(
+    uids=None,
+    workers: int = ADVICE_PRECOMPUTE_WORKERS,
+    requests_per_minute: int = GEMINI_REQUESTS_PER_MINUTE,
+    checkpoint_path: str = ADVICE_PRECOMPUTE_CHECKPOINT,
+    generator=None,
+):
+    """Generate advice for every stale user, resuming an unfinished run if there is one."""
+    checkpoint = RunCheckpoint.load(checkpoint_path)
+    if checkpoint is None or checkpoint.finished:
+        checkpoint = RunCheckpoint.start(checkpoint_path, find_stale_users(uids))
+    else:
+        print(f"Resuming run {checkpoint.state['run_id']}: {len(checkpoint.remaining())} user(s) left")
+
+    model = BudgetedModel(generator or financial_advice.model, RateLimiter(requests_per_minute))
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="advice") as pool:
+        futures = {pool.submit(process_user, uid, model): uid for uid, _ in checkpoint.remaining()}
+        for future in as_completed(futures):
+            uid = futures[future]
+            try:
+                checkpoint.record(uid, cached=future.result())
+            except Exception as e:
+                checkpoint.record(uid, error=str(e))
+
+    checkpoint.finish()
+    return checkpoint.summary()
+
+
+def start_scheduler(interval_minutes: int = ADVICE_PRECOMPUTE_INTERVAL_MINUTES, **kwargs):
+    """Run run_precompute every interval_minutes on a daemon thread."""
+
+    def loop():
+        while True:
+            try:
+                print(f"Advice precompute: {run_precompute(**kwargs)}")
+            except Exception as e:
+                print(f"Advice precompute failed: {e}")
+            time.sleep(interval_minutes * 60)
+
+    thread = threading.Thread(target=loop, name="advice-precompute", daemon=True)
+    thread.start()
+    return thread
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute financial advice for users whose data changed.")
+    parser.add_argument("uids", nargs="*", help="limit the run to these users")
+    parser.add_argument("--workers", type=int, default=ADVICE_PRECOMPUTE_WORKERS)
+    parser.add_argument("--rpm", type=int, default=GEMINI_REQUESTS_PER_MINUTE, help="Gemini requests per minute")
+    parser.add_argument("--checkpoint", default=ADVICE_PRECOMPUTE_CHECKPOINT)
+    parser.add_argument("--every", type=int, default=0, help="keep running every N minutes")
+    parser.add_argument("--stub-model", action="store_true", help="use a canned response instead of Gemini")
+    args = parser.parse_args()
+
+    options = {
+        "uids": args.uids or None,
+        "workers": args.workers,
+        "requests_per_minute": args.rpm,
+        "checkpoint_path": args.checkpoint,
+        "generator": StubAdviceModel() if args.stub_model else None,
+    }
+    while True:
+        print(run_precompute(**options))
+        if not args.every:
+            break
+        time.sleep(args.every * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+import json
+
+
+class AdviceStreamParser:
+    """Pulls finished pieces out of the advice JSON while it is still streaming.
+
+    feed() takes raw model text (code fences and all) and returns
+    ("insight", dict) for every element of the top-level "insights" array
+    and ("monthly_health", dict) for that object, each as soon as its
+    closing brace arrives. Only structure is tracked, never partial values.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self.pos = 0
+        self.stack = []  # (bracket, key in parent object, start offset)
+        self.in_string = False
+        self.escaped = False
+        self.string_start = 0
+        self.last_string = None
+        self.pending_key = None
+
+    def feed(self, chunk: str):
+        self.text += chunk
+        events = []
+        text = self.text
+        for i in range(self.pos, len(text)):
+            c = text[i]
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif c == "\\":
+                    self.escaped = True
+                elif c == '"':
+                    self.in_string = False
+                    self.last_string = text[self.string_start:i + 1]
+                continue
+
+            if c == '"':
+                self.in_string = True
+                self.string_start = i
+            elif c == ":" and self.last_string and self.stack and self.stack[-1][0] == "{":
+                self.pending_key = json.loads(self.last_string)
+            elif c == ",":
+                self.pending_key = None
+            elif c in "{[":
+                key = self.pending_key if self.stack and self.stack[-1][0] == "{" else None
+                self.stack.append((c, key, i))
+                self.pending_key = None
+            elif c in "}]" and self.stack:
+                _, key, start = self.stack.pop()
+                event = self._event_for(key)
+                if event:
+                    try:
+                        events.append((event, json.loads(text[start:i + 1])))
+                    except json.JSONDecodeError:
+                        pass
+        self.pos = len(text)
+        return events
+
+    def _event_for(self, key):
+        # Called after the closed value is popped, so the stack holds its parents
+        if len(self.stack) == 2 and self.stack[1][0] == "[" and self.stack[1][1] == "insights":
+            return "insight"
+        if len(self.stack) == 1 and key == "monthly_health":
+            return "monthly_health"
+        return None
+
+
+def sse_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
@@ -0,0 +1,148 @@
+import re
+from datetime import datetime
+import numpy as np
+
+# Type codes; anything that is not a credit or debit still counts as a row
+CREDIT, DEBIT, OTHER = 0, 1, 2
+TYPE_CODES = {"credit": CREDIT, "debit": DEBIT}
+
+# NumPy also accepts partial dates such as "2024-06"; only full dates are bulk-parsed
+ISO_DATE = re.compile(r"\d{4}-\d{2}-\d{2}")
+
+
+def parse_date(value, strict: bool = False):
+    """value as YYYY-MM-DD if strptime("%Y-%m-%d") accepts it, else None.
+
+    Zero-padded dates skip strptime unless strict, which also checks the
+    day exists in its month.
+    """
+    if ISO_DATE.fullmatch(value) and not strict:
+        return value
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").strftime("%Y-%m-%d")
+    except ValueError:
+        return None
+
+
+class TransactionColumns:
+    """A user's transactions as columnar NumPy arrays.
+
+    amount is float64, month is int32 months since 1970-01, and type and
+    category are dictionary-encoded codes. Rows are dropped exactly when
+    rollups.normalize_transaction would drop them: a date strptime cannot
+    read as %Y-%m-%d, or an amount float() rejects.
+    """
+
+    def __init__(self, amount, month, type_code, category_code, categories, records):
+        self.amount = amount
+        self.month = month
+        self.type_code = type_code
+        self.category_code = category_code
+        self.categories = categories
+        self.records = records
+
+    @classmethod
+    def from_records(cls, txns):
+        records, amounts, dates = [], [], []
+        for t in txns:
+            try:
+                amount = float(t["amount"])
+                tx_date = t["date"]
+            except (KeyError, TypeError, ValueError):
+                continue
+            if not isinstance(tx_date, str):
+                continue
+            tx_date = parse_date(tx_date)
+            if tx_date is None:
+                continue
+            records.append(t)
+            amounts.append(amount)
+            dates.append(tx_date)
+
+        try:
+            parsed = np.array(dates, dtype="datetime64[D]")
+        except ValueError:
+            # Something like 2024-02-30 somewhere: check every date properly
+            keep = [i for i, d in enumerate(dates) if parse_date(d, strict=True)]
+            records = [records[i] for i in keep]
+            amounts = [amounts[i] for i in keep]
+            parsed = np.array([dates[i] for i in keep], dtype="datetime64[D]")
+
+        categories = {}
+        category_codes = [categories.setdefault(t.get("category", "Others"), len(categories)) for t in records]
+        type_codes = [TYPE_CODES.get(str(t.get("type", "")).strip().lower(), OTHER) for t in records]
+
+        return cls(
+            amount=np.array(amounts, dtype=np.float64),
+            month=parsed.astype("datetime64[M]").astype(np.int32),
+            type_code=np.array(type_codes, dtype=np.int8),
+            category_code=np.array(category_codes, dtype=np.int32),
+            categories=list(categories),
+            records=records,
+        )
+
+    def __len__(self):
+        return len(self.amount)
+
+    def debit_entry(self, i):
+        t = self.records[i]
+        return {
+            "id": t.get("id"),
+            "title": t.get("title", "N/A"),
+            "amount": float(self.amount[i]),
+            "category": self.categories[self.category_code[i]],
+            "date": t["date"],
+        }
+
+    def month_key(self, month_code) -> str:
+        return str(np.datetime64(int(month_code), "M"))
+
+    def rollups(self, top_k: int = 3) -> dict:
+        """Per-month rollups, in the shape stored under monthly_rollups."""
+        if not len(self):
+            return {}
+
+        months, month_idx = np.unique(self.month, return_inverse=True)
+        n_months, n_cats = len(months), len(self.categories)
+
+        type_sums = np.bincount(month_idx * 3 + self.type_code, weights=self.amount, minlength=n_months * 3).reshape(n_months, 3)
+        counts = np.bincount(month_idx, minlength=n_months)
+
+        cell = month_idx * n_cats + self.category_code
+        cat_counts = np.bincount(cell, minlength=n_months * n_cats).reshape(n_months, n_cats)
+        cat_sums = {
+            tx_type: np.bincount(
+                cell[self.type_code == code], weights=self.amount[self.type_code == code], minlength=n_months * n_cats
+            ).reshape(n_months, n_cats)
+            for tx_type, code in TYPE_CODES.items()
+        }
+
+        # Debits ordered by month, then amount descending, then statement order
+        debit_rows = np.flatnonzero(self.type_code == DEBIT)
+        debit_rows = debit_rows[np.lexsort((debit_rows, -self.amount[debit_rows], month_idx[debit_rows]))]
+        debit_months = month_idx[debit_rows]
+        group_starts = np.searchsorted(debit_months, np.arange(n_months), side="left")
+        group_ends = np.searchsorted(debit_months, np.arange(n_months), side="right")
+
+        rollups = {}
+        for m in range(n_months):
+            key = self.month_key(months[m])
+            rollups[key] = {
+                "month": key,
+                "credit_total": float(type_sums[m, CREDIT]),
+                "debit_total": float(type_sums[m, DEBIT]),
+                "count": int(counts[m]),
+                "categories": {
+                    self.categories[c]: {
+                        "credit": float(cat_sums["credit"][m, c]),
+                        "debit": float(cat_sums["debit"][m, c]),
+                        "count": int(cat_counts[m, c]),
+                    }
+                    for c in np.flatnonzero(cat_counts[m])
+                },
+                "largest_debits": [
+                    self.debit_entry(i)
+                    for i in debit_rows[group_starts[m]:min(group_ends[m], group_starts[m] + top_k)]
+                ],
+            }
+        return rollups
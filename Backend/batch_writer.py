@@ -0,0 +1,54 @@
+from firebase_config import db
+
+# Firestore rejects a single commit with more than 500 writes
+MAX_BATCH_SIZE = 500
+
+
+def chunked(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def commit_in_batches(writes, batch_size: int = MAX_BATCH_SIZE, merge: bool = False):
+    """Commit (doc_ref, data) pairs as chunked WriteBatch commits.
+
+    A pair whose data is None deletes that document.
+
+    A failing chunk does not stop the remaining chunks; every chunk is
+    reported so callers can tell exactly which writes were not stored.
+    """
+    writes = list(writes)
+    batch_size = max(1, min(batch_size, MAX_BATCH_SIZE))
+
+    written = 0
+    chunks = []
+    for index, chunk in enumerate(chunked(writes, batch_size)):
+        batch = db.batch()
+        for doc_ref, data in chunk:
+            if data is None:
+                batch.delete(doc_ref)
+            else:
+                batch.set(doc_ref, data, merge=merge)
+
+        try:
+            batch.commit()
+            written += len(chunk)
+            chunks.append({"chunk": index, "size": len(chunk), "ok": True})
+        except Exception as e:
+            chunks.append({
+                "chunk": index,
+                "size": len(chunk),
+                "ok": False,
+                "error": str(e),
+                "doc_ids": [doc_ref.id for doc_ref, _ in chunk],
+            })
+
+    return {
+        "written": written,
+        "failed": len(writes) - written,
+        "chunks": chunks,
+    }
+
+
+def failed_chunks(result):
+    return [c for c in result["chunks"] if not c["ok"]]
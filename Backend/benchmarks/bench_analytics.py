@@ -0,0 +1,81 @@
+# Run from Backend/: python benchmarks/bench_analytics.py [rows]
+#
+# Times rollups.build_rollups (the columnar core, used by rebuilds and by
+# every upload) against the per-row add_transaction loop it replaced.
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rollups import add_transaction, build_rollups, empty_rollup, normalize_transaction
+
+CATEGORIES = ["Dining", "Groceries", "Utilities", "Transportation", "Shopping", "Entertainment", "Healthcare", "Salary", "Others"]
+
+
+def legacy_build_rollups(transactions):
+    rollups = {}
+    for tx in transactions:
+        normalized = normalize_transaction(tx)
+        if not normalized:
+            continue
+        month = normalized[0]
+        add_transaction(rollups.setdefault(month, empty_rollup(month)), tx)
+    return rollups
+
+
+def make_rows(n, seed=11):
+    rng = random.Random(seed)
+    start = date(2019, 1, 1)
+    return [
+        {
+            "id": str(i),
+            "title": f"merchant {rng.randint(0, 500)}",
+            "date": str(start + timedelta(days=rng.randint(0, 6 * 365))),
+            "amount": round(rng.uniform(10, 50000), 2),
+            "type": rng.choice(["credit", "debit", "debit", "debit"]),
+            "category": rng.choice(CATEGORIES),
+        }
+        for i in range(n)
+    ]
+
+
+def timed(fn, repeat=3):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return result, best * 1000
+
+
+def same_rollups(old, new):
+    if old.keys() != new.keys():
+        return False
+    for month, a in old.items():
+        b = new[month]
+        if a["count"] != b["count"] or abs(a["debit_total"] - b["debit_total"]) > 1e-3:
+            return False
+        if [d["id"] for d in a["largest_debits"]] != [d["id"] for d in b["largest_debits"]]:
+            return False
+        for cat, totals in a["categories"].items():
+            if abs(totals["debit"] - b["categories"][cat]["debit"]) > 1e-3:
+                return False
+    return True
+
+
+def main(n=100_000):
+    rows = make_rows(n)
+    old, legacy_ms = timed(lambda: legacy_build_rollups(rows))
+    new, columnar_ms = timed(lambda: build_rollups(rows))
+    assert same_rollups(old, new)
+
+    print(f"{n} transactions, {len(new)} months")
+    print(f"  add_transaction loop : {legacy_ms:8.1f} ms")
+    print(f"  build_rollups        : {columnar_ms:8.1f} ms  ({legacy_ms / columnar_ms:.1f}x)")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
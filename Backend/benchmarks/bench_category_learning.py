@@ -0,0 +1,72 @@
+# Run from Backend/: python benchmarks/bench_category_learning.py
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from category_learning import LearningIndex, match_transaction
+
+
+def legacy_match_transaction(tx, learning_map, tolerance=10):
+    # The linear scan previously used by the upload endpoint
+    tx_title = tx["title"].lower().strip()
+    tx_amount = int(tx["amount"])
+
+    for key, category in learning_map.items():
+        try:
+            learned_title, learned_amount = key.rsplit("_", 1)
+            if (
+                learned_title == tx_title and
+                abs(int(learned_amount) - tx_amount) <= tolerance
+            ):
+                return category
+        except:
+            continue
+    return None
+
+
+def main(rules=10_000, transactions=1_000, seed=7):
+    rng = random.Random(seed)
+    titles = [f"merchant {i}" for i in range(rules // 4)]
+    categories = ["Dining", "Groceries", "Shopping", "Utilities", "Others"]
+
+    learning_map = {}
+    while len(learning_map) < rules:
+        key = f"{rng.choice(titles)}_{rng.randint(10, 5000)}"
+        learning_map[key] = rng.choice(categories)
+
+    # Half the transactions land near a learned rule, half are random
+    learned = list(learning_map)
+    txns = []
+    for i in range(transactions):
+        if i % 2:
+            title, amount = rng.choice(learned).rsplit("_", 1)
+            txns.append({"title": f" {title.upper()} ", "amount": int(amount) + rng.uniform(-12, 12)})
+        else:
+            txns.append({"title": rng.choice(titles), "amount": rng.randint(10, 5000) + rng.random()})
+
+    start = time.perf_counter()
+    legacy = [legacy_match_transaction(tx, learning_map) for tx in txns]
+    legacy_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    index = LearningIndex(learning_map)
+    build_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    indexed = [match_transaction(tx, index) for tx in txns]
+    lookup_s = time.perf_counter() - start
+
+    assert legacy == indexed, "indexed lookup disagrees with the linear scan"
+    matched = sum(1 for c in indexed if c)
+    print(f"{rules} rules x {transactions} transactions ({matched} matched)")
+    print(f"  linear scan : {legacy_s * 1000:9.1f} ms")
+    print(f"  index build : {build_s * 1000:9.1f} ms")
+    print(f"  index lookup: {lookup_s * 1000:9.1f} ms")
+    print(f"  speedup     : {legacy_s / (build_s + lookup_s):9.1f}x (including build)")
+
+
+if __name__ == "__main__":
+    main()
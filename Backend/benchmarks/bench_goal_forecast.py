@@ -0,0 +1,46 @@
+# Run from Backend/: python benchmarks/bench_goal_forecast.py [paths ...]
+#
+# Times the Monte Carlo kernel behind /goals/forecast for a few goal counts.
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from goal_forecast import forecast_goals, FORECAST_HORIZON_MONTHS
+
+
+def make_goals(rng, n):
+    goals = []
+    for i in range(n):
+        target = rng.choice([50_000, 200_000, 1_000_000])
+        goals.append({
+            "id": f"goal-{i}",
+            "target_amount": target,
+            "allocated": round(target * rng.uniform(0, 0.5)),
+            "manual_allocated": rng.choice([None, None, 2_000]),
+            "deadline": f"{rng.randint(2027, 2031)}-{rng.randint(1, 12):02d}-28",
+        })
+    return goals
+
+
+def main():
+    path_counts = [int(arg) for arg in sys.argv[1:]] or [10_000, 50_000, 100_000]
+    rng = random.Random(7)
+    history = [rng.gauss(25_000, 15_000) for _ in range(24)]
+
+    print(f"horizon {FORECAST_HORIZON_MONTHS} months, 24 months of history")
+    for n_goals in (1, 5, 10):
+        goals = make_goals(rng, n_goals)
+        for paths in path_counts:
+            best = float("inf")
+            for _ in range(5):
+                start = time.perf_counter()
+                forecast_goals(history, goals, "2026-11", paths=paths)
+                best = min(best, time.perf_counter() - start)
+            print(f"  {n_goals:>2} goal(s) {paths:>7} paths  {best * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+# Run from Backend/: python benchmarks/bench_projection.py [docs]
+#
+# Local fake of the Firestore read path: documents are encoded the way the
+# REST/JSON API returns them ({"fields": {"amount": {"doubleValue": ...}}}),
+# then decoded back into plain dicts the way DocumentSnapshot.to_dict() does.
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from transaction_reads import ROLLUP_FIELDS
+
+
+def make_transaction(rng, i):
+    return {
+        "id": f"{i:08d}-6f1c-4b7e-9a51-{rng.getrandbits(48):012x}",
+        "user": "Xq2v9LmP0aZr7TnB3kYw",
+        "statement_id": "0b8f3c1e-2d4a-4e6b-8c9d-7a1f2e3d4c5b",
+        "date": f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+        "title": rng.choice(["SWIGGY", "AMAZON PAY", "VIKRANT", "PHYSICSWALLAH", "AIRTEL"]),
+        "amount": round(rng.uniform(10, 50000), 2),
+        "type": rng.choice(["credit", "debit"]),
+        "payment_method": rng.choice(["UPI", "NEFT", "IMPS"]),
+        "category": rng.choice(["Dining", "Shopping", "Utilities", "Salary", "Others"]),
+        "description": "UPI payment to merchant for order",
+        "confidence": rng.randint(50, 100),
+        "category_overridden_by_learning": False,
+    }
+
+
+def encode_value(value):
+    if isinstance(value, bool):
+        return {"booleanValue": value}
+    if isinstance(value, int):
+        return {"integerValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": value}
+
+
+def decode_value(value):
+    (kind, raw), = value.items()
+    if kind == "integerValue":
+        return int(raw)
+    return raw
+
+
+def encode_documents(docs, fields=None):
+    return [
+        json.dumps({
+            "name": f"projects/demo/databases/(default)/documents/users/u/transactions/{d['id']}",
+            "fields": {k: encode_value(v) for k, v in d.items() if fields is None or k in fields},
+        }).encode("utf-8")
+        for d in docs
+    ]
+
+
+def decode_documents(payloads):
+    return [
+        {k: decode_value(v) for k, v in json.loads(p)["fields"].items()}
+        for p in payloads
+    ]
+
+
+def measure(label, docs, fields):
+    payloads = encode_documents(docs, fields)
+    total_bytes = sum(len(p) for p in payloads)
+    start = time.perf_counter()
+    decode_documents(payloads)
+    decode_ms = (time.perf_counter() - start) * 1000
+    print(f"  {label:<28} {total_bytes / 1024:9.1f} KiB  decode {decode_ms:7.1f} ms")
+    return total_bytes, decode_ms
+
+
+def main(n=20_000, seed=3):
+    rng = random.Random(seed)
+    docs = [make_transaction(rng, i) for i in range(n)]
+    print(f"{n} transaction documents")
+    full_bytes, full_ms = measure("full documents", docs, None)
+    b, ms = measure("rollup projection", docs, ROLLUP_FIELDS)
+    print(f"  {'':<28} {b / full_bytes * 100:8.0f}% bytes  {ms / full_ms * 100:6.0f}% decode time")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20_000)
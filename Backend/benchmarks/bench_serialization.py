@@ -0,0 +1,74 @@
+# Run from Backend/: python benchmarks/bench_serialization.py [rows ...]
+#
+# Encodes a /transactions-shaped payload the way the old default path did
+# (jsonable_encoder + json.dumps, i.e. JSONResponse) and with the orjson and
+# MessagePack encoders in serialization.py.
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from fastapi.encoders import jsonable_encoder
+from serialization import dumps_json, dumps_msgpack
+
+
+def make_transaction(rng, i):
+    return {
+        "id": f"{i:08d}-6f1c-4b7e-9a51-{rng.getrandbits(48):012x}",
+        "user": "Xq2v9LmP0aZr7TnB3kYw",
+        "statement_id": "0b8f3c1e-2d4a-4e6b-8c9d-7a1f2e3d4c5b",
+        "date": f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+        "title": rng.choice(["SWIGGY", "AMAZON PAY", "VIKRANT", "PHYSICSWALLAH", "AIRTEL"]),
+        "amount": round(rng.uniform(10, 50000), 2),
+        "type": rng.choice(["credit", "debit"]),
+        "payment_method": rng.choice(["UPI", "NEFT", "IMPS"]),
+        "category": rng.choice(["Dining", "Shopping", "Utilities", "Salary", "Others"]),
+        "description": "UPI payment to merchant for order ₹",
+        "confidence": rng.randint(50, 100),
+        "category_overridden_by_learning": False,
+    }
+
+
+def legacy_dumps(content) -> bytes:
+    # What FastAPI does for a returned dict with the stock JSONResponse
+    return json.dumps(
+        jsonable_encoder(content), ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def best_of(fn, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10_000, 100_000]
+    rng = random.Random(42)
+
+    for n in sizes:
+        transactions = [make_transaction(rng, i) for i in range(n)]
+        payload = {"transactions": transactions, "count": n, "next_cursor": None}
+
+        print(f"{n} transactions")
+        baseline = None
+        for label, fn in (
+            ("jsonable_encoder + json", legacy_dumps),
+            ("orjson", dumps_json),
+            ("msgpack", dumps_msgpack),
+        ):
+            seconds, body = best_of(lambda: fn(payload))
+            baseline = baseline or seconds
+            print(f"  {label:<24} {seconds * 1000:8.1f} ms  {len(body) / 1024:9.0f} KiB  {baseline / seconds:5.1f}x")
+
+        assert json.loads(dumps_json(payload)) == json.loads(legacy_dumps(payload))
+
+
+if __name__ == "__main__":
+    main()
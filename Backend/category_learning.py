@@ -0,0 +1,78 @@
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+
+
+def learning_key(title: str, amount) -> str:
+    return f"{title.lower().strip()}_{int(amount)}"
+
+
+def build_learning_map(learning_docs) -> dict:
+    learning_map = {}
+    for data in learning_docs:
+        learning_map[learning_key(data["title"], data["amount"])] = data["category"]
+    return learning_map
+
+
+class LearningIndex:
+    """Learned categories indexed by title, with amounts sorted for range lookups.
+
+    Ties inside the tolerance window go to the rule that comes first in the
+    learning map, the same rule the old linear scan returned.
+    """
+
+    def __init__(self, learning_map: dict):
+        rules = defaultdict(list)
+        for rank, (key, category) in enumerate(learning_map.items()):
+            try:
+                learned_title, learned_amount = key.rsplit("_", 1)
+                rules[learned_title].append((int(learned_amount), rank, category))
+            except ValueError:
+                continue
+
+        self._index = {}
+        for title, entries in rules.items():
+            entries.sort()
+            self._index[title] = (
+                [amount for amount, _, _ in entries],
+                [(rank, category) for _, rank, category in entries],
+            )
+
+    def __len__(self):
+        return sum(len(amounts) for amounts, _ in self._index.values())
+
+    def match(self, tx, tolerance=10):
+        tx_title = tx["title"].lower().strip()
+        tx_amount = int(tx["amount"])
+
+        entry = self._index.get(tx_title)
+        if not entry:
+            return None
+
+        amounts, ranked = entry
+        lo = bisect_left(amounts, tx_amount - tolerance)
+        hi = bisect_right(amounts, tx_amount + tolerance)
+        if lo == hi:
+            return None
+        return min(ranked[lo:hi])[1]
+
+
+def match_transaction(tx, learning_index: LearningIndex, tolerance=10):
+    return learning_index.match(tx, tolerance)
+
+
+def apply_learned_category(tx: dict, learning_index: LearningIndex) -> dict:
+    matched_category = None
+    # Gemini rows can come back with a null title or amount; they are kept, just never matched
+    if isinstance(tx.get("title"), str):
+        try:
+            matched_category = match_transaction(tx, learning_index)
+        except (KeyError, TypeError, ValueError):
+            matched_category = None
+
+    if matched_category:
+        tx["category"] = matched_category
+        tx["confidence"] = 100
+        tx["category_overridden_by_learning"] = True
+    else:
+        tx["category_overridden_by_learning"] = False
+    return tx
@@ -0,0 +1,17 @@
+from firebase_admin import firestore
+from firebase_config import db
+
+# users/{uid}.data_version goes up on every write that can change what a read returns:
+# transactions, goals and goal contributions, and category changes. Advice is
+# versioned by its own document (see financial_advice.get_financial_advice).
+
+
+def bump_data_version(uid: str):
+    db.collection("users").document(uid).set({"data_version": firestore.Increment(1)}, merge=True)
+
+
+def get_data_version(uid: str) -> int:
+    doc = db.collection("users").document(uid).get()
+    if not doc.exists:
+        return 0
+    return (doc.to_dict() or {}).get("data_version", 0)
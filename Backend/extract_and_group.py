@@ -1,33 +1,88 @@
+import multiprocessing
+import os
 import re
 import pdfplumber
-from typing import List, Optional
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Iterator, List, Optional, Union
 from io import BytesIO
 
-def extract_text_with_pdfplumber(content: bytes, password: Optional[str] = None) -> str:
-    text = ""
+# PDFs with at least this many pages are extracted on a process pool
+PDF_PARALLEL_PAGE_THRESHOLD = int(os.getenv("PDF_PARALLEL_PAGE_THRESHOLD", "20"))
+PDF_MAX_WORKERS = int(os.getenv("PDF_MAX_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+
+def pdf_error(e: Exception) -> Exception:
+    if "File has not been decrypted" in str(e):
+        return Exception("PDF is password-protected. Please provide the correct password.")
+    return Exception(f"PDF extraction failed: {str(e)}")
+
+
+def page_lines(page_text: Optional[str]) -> Iterator[str]:
+    if not page_text:
+        return
+    for line in page_text.splitlines():
+        line = line.strip()
+        if line:
+            yield line
+
+
+def extract_page_range(content: bytes, password: Optional[str], start: int, end: int) -> List[str]:
+    # Runs in a worker process; each worker opens its own copy of the PDF
+    with pdfplumber.open(BytesIO(content), password=password) as pdf:
+        texts = []
+        for page in pdf.pages[start:end]:
+            texts.append(page.extract_text() or "")
+            page.close()
+        return texts
+
+
+def iter_pdf_lines(
+    content: bytes,
+    password: Optional[str] = None,
+    parallel_threshold: int = PDF_PARALLEL_PAGE_THRESHOLD,
+    max_workers: int = PDF_MAX_WORKERS,
+) -> Iterator[str]:
+    """Yield non-empty, stripped lines page by page."""
     try:
         with pdfplumber.open(BytesIO(content), password=password) as pdf:
+            page_count = len(pdf.pages)
+            if max_workers <= 1 or page_count < parallel_threshold:
+                for page in pdf.pages:
+                    yield from page_lines(page.extract_text())
+                    # Drop cached layout objects so memory stays flat across pages
+                    page.close()
+                return
 
-  
-            for page in pdf.pages:
-                page_text = page.extract_text()
-                if page_text:
-                    text += page_text + "\n"
-        
+        step = -(-page_count // max_workers)
+        ranges = [(start, min(start + step, page_count)) for start in range(0, page_count, step)]
+        # Spawned, not forked: the server process has live gRPC threads a forked child could deadlock on
+        with ProcessPoolExecutor(max_workers=len(ranges), mp_context=multiprocessing.get_context("spawn")) as executor:
+            futures = [
+                executor.submit(extract_page_range, content, password, start, end)
+                for start, end in ranges
+            ]
+            # Consume in page order so grouping sees the statement as written
+            for future in futures:
+                for page_text in future.result():
+                    yield from page_lines(page_text)
     except Exception as e:
-        if "File has not been decrypted" in str(e):
-            raise Exception("PDF is password-protected. Please provide the correct password.")
-        raise Exception(f"PDF extraction failed: {str(e)}")
-    return text.strip()
+        raise pdf_error(e)
 
 
-def group_transactions_from_lines(raw_text: str) -> List[str]:
-    lines = [line.strip() for line in raw_text.splitlines() if line.strip()]
+def extract_text_with_pdfplumber(content: bytes, password: Optional[str] = None) -> str:
+    return "\n".join(iter_pdf_lines(content, password=password))
+
+
+def group_transactions_from_lines(raw_text: Union[str, Iterable[str]]) -> List[str]:
+    lines = raw_text.splitlines() if isinstance(raw_text, str) else raw_text
     date_line_pattern = re.compile(r'^\d{2}-\d{2}-\d{2}\s+\d{2}-\d{2}-\d{2}')
     transactions = []
     current_transaction = []
 
     for line in lines:
+        line = line.strip()
+        if not line:
+            continue
         if date_line_pattern.match(line):
             if current_transaction:
                 transactions.append(" ".join(current_transaction))
@@ -95,3 +150,132 @@ def extract_months_from_raw_blocks(transaction_blocks: List[str]) -> List[str]:
 
 
     return sorted(months)
+
+
+# Fast path for well-formed "DD-MM-YY DD-MM-YY <narration> <ref> <amount> DR|CR" lines
+fast_path_line_pattern = re.compile(
+    r'^(?P<day>\d{2})-(?P<month>\d{2})-(?P<year>\d{2})\s+\d{2}-\d{2}-\d{2}\s+'
+    r'(?P<narration>.+?)\s+(?P<ref>\d{6,})\s+(?:-\s+)?'
+    r'(?P<amount>\d{1,3}(?:,\d{2,3})*(?:\.\d{2})|\d+\.\d{2})\s+(?P<drcr>DR|CR)$',
+    re.IGNORECASE
+)
+
+payment_method_prefixes = [
+    ("UPI", "UPI"),
+    ("NEFT", "NEFT"),
+    ("IMPS", "IMPS"),
+    ("ACH", "ACH"),
+    ("CHQ", "CHEQUE"),
+    ("CHEQUE", "CHEQUE"),
+    ("CASH", "CASH"),
+]
+
+# Same keyword clues the Gemini prompt uses; anything else still goes to the LLM
+category_keywords = {
+    "Dining": ["ZOMATO", "SWIGGY", "DOMINOS", "DOMINO'S", "KFC", "STARBUCKS", "WOW MOMO", "HARD ROCK CAFE"],
+    "Groceries": ["DMART", "D-MART", "RELIANCE FRESH", "BIG BAZAAR", "BIGBAZAAR", "JIOMART", "FRESHTOHOME"],
+    "Shopping": ["AMAZON", "FLIPKART", "MYNTRA", "ZUDIO", "H&M", "LIFESTYLE"],
+    "Entertainment": ["NETFLIX", "PVR", "BOOKMYSHOW", "HOTSTAR"],
+    "Healthcare": ["APOLLO", "MEDLIFE", "PRACTO", "FORTIS", "AIIMS", "PHARMACY", "HOSPITAL", "CLINIC"],
+    "Utilities": ["AIRTEL", "BSNL", "BROADBAND", "ELECTRICITY", "WATER BILL", "DTH", "RECHARGE"],
+}
+
+
+def detect_payment_method(narration: str) -> str:
+    head = narration.upper()
+    for prefix, method in payment_method_prefixes:
+        if head.startswith(prefix):
+            return method
+    return "Not specified"
+
+
+def extract_title(narration: str, payment_method: str) -> Optional[str]:
+    if payment_method in ("UPI", "IMPS"):
+        # UPI/DR/<ref>/<NAME> /<bank>/<vpa>/...
+        parts = narration.split("/")
+        if len(parts) >= 4 and parts[3].strip():
+            return parts[3].strip()
+    elif payment_method == "NEFT":
+        # NEFT*<ifsc>*<ref> <NAME>
+        words = narration.split("*")[-1].split()
+        if len(words) >= 2:
+            return " ".join(words[1:])
+    return None
+
+
+def categorize_by_keywords(text: str) -> Optional[str]:
+    text = text.upper()
+    for category, keywords in category_keywords.items():
+        for keyword in keywords:
+            if re.search(rf"(?<![A-Z]){re.escape(keyword)}(?![A-Z])", text):
+                return category
+    return None
+
+
+def parse_statement_line(block: str) -> Optional[dict]:
+    match = fast_path_line_pattern.match(block.strip())
+    if not match:
+        return None
+
+    try:
+        date = datetime(2000 + int(match["year"]), int(match["month"]), int(match["day"]))
+    except ValueError:
+        return None
+
+    narration = match["narration"].strip()
+    payment_method = detect_payment_method(narration)
+    title = extract_title(narration, payment_method)
+    if not title:
+        return None
+
+    amount = float(match["amount"].replace(",", ""))
+    tx_type = "credit" if match["drcr"].upper() == "CR" else "debit"
+
+    if tx_type == "credit" and 25000 <= amount <= 180000 and date.day <= 7:
+        category, confidence = "Salary", 95
+    else:
+        category = categorize_by_keywords(f"{title} {narration}")
+        confidence = 90
+    if not category:
+        # Parsed fine, but categorisation is left to Gemini
+        return None
+
+    return {
+        "date": date.strftime("%Y-%m-%d"),
+        "title": title,
+        "amount": amount,
+        "type": tx_type,
+        "payment_method": payment_method,
+        "category": category,
+        "description": f"{payment_method} {'to' if tx_type == 'debit' else 'from'} {title}",
+        "confidence": confidence,
+        "parsed_by": "fast_path",
+    }
+
+
+def split_fast_path(transaction_blocks: List[str]) -> dict:
+    parsed, line_indices = [], []
+    llm_blocks, llm_line_indices = [], []
+    for index, block in enumerate(transaction_blocks):
+        tx = parse_statement_line(block)
+        if tx:
+            parsed.append(tx)
+            line_indices.append(index)
+        else:
+            llm_blocks.append(block)
+            llm_line_indices.append(index)
+
+    total = len(transaction_blocks)
+    # Block positions travel alongside, so merged results can be put back in statement order
+    return {
+        "transactions": parsed,
+        "line_indices": line_indices,
+        "llm_blocks": llm_blocks,
+        "llm_line_indices": llm_line_indices,
+        "stats": {
+            "blocks": total,
+            "parsed_locally": len(parsed),
+            "sent_to_llm": len(llm_blocks),
+            "hit_rate": round(len(parsed) / total * 100, 1) if total else 0,
+        },
+    }
@@ -1,20 +1,28 @@
-from fastapi import APIRouter, Request, HTTPException
+from fastapi import APIRouter, Request, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from firebase_admin import firestore
 from firebase_config import verify_firebase_token
 from datetime import datetime
 import google.generativeai as genai
+import hashlib
 import json
 import re
 import os
+import threading
+import time
+from collections import deque
 from dateutil.relativedelta import relativedelta
-import calendar
-from collections import defaultdict
+from rollups import load_rollups, empty_rollup, merge_rollup
+from response_cache import conditional_response
+from advice_stream import AdviceStreamParser, sse_event
+from goals import auto_allocated_totals
 
 router = APIRouter(prefix="/ai", tags=["Financial Advice"])
 db = firestore.client()
 
 genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
-model = genai.GenerativeModel("gemini-2.0-flash")
+ADVICE_MODEL = "gemini-2.0-flash"
+model = genai.GenerativeModel(ADVICE_MODEL)
 def parse_date_safe(date_str):
     try:
         return datetime.strptime(date_str.strip(), "%Y-%m-%d")
@@ -22,24 +30,20 @@ def parse_date_safe(date_str):
 
         return None
 
-@router.post("/financial-advice/generate")
-def generate_financial_advice(request: Request):
-    user_id = verify_firebase_token(request)
-    if not user_id:
-        raise HTTPException(status_code=401, detail="Unauthorized")
-
-    # Fetch transactions
-    txns_ref = db.collection("users").document(user_id).collection("transactions")
-    txns = [doc.to_dict() for doc in txns_ref.stream()]
-
-    # Filter from Jan 1 to today
+def build_advice_prompt(user_id: str) -> str:
+    # Totals come from the monthly rollups for Jan 1 onward
     jan1 = datetime(datetime.today().year, 1, 1)
     today = datetime.today()
-    txns = [t for t in txns if "date" in t and datetime.strptime(t["date"], "%Y-%m-%d") >= jan1]
+    rollups = load_rollups(user_id)
+    year_totals = empty_rollup()
+    for month, rollup in rollups.items():
+        if month >= jan1.strftime("%Y-%m"):
+            merge_rollup(year_totals, rollup)
 
     # Filter and calculate totals
-    income = sum(t["amount"] for t in txns if t["category"] == "Salary")
-    expenses = sum(t["amount"] for t in txns if t["type"] == "debit")
+    salary = year_totals["categories"].get("Salary", {})
+    income = salary.get("credit", 0) + salary.get("debit", 0)
+    expenses = year_totals["debit_total"]
     savings = income - expenses
     savings_rate = round((savings / income) * 100, 2) if income else 0
 
@@ -47,37 +51,11 @@ def generate_financial_advice(request: Request):
     num_months = max((today - jan1).days // 30, 1)
 
     # Use last full month for budgeting
-    today = datetime.today()
     last_month = today.replace(day=1) - relativedelta(months=1)
-    last_month_year = last_month.year
-    last_month_month = last_month.month
-
-    last_day = calendar.monthrange(last_month_year, last_month_month)[1]
-
-    last_month_start = datetime(last_month_year, last_month_month, 1)
-    last_month_end = datetime(last_month_year, last_month_month, last_day)
-
-   
-    month_txns = []
-    for t in txns:
-        dt = parse_date_safe(t.get("date", ""))
-        if not dt:
-            continue
-        if last_month_start <= dt <= last_month_end:
-            month_txns.append(t)
-      
-        
-
-
+    month_rollup = rollups.get(last_month.strftime("%Y-%m"), empty_rollup())
 
-    month_income = sum(
-    t["amount"] for t in month_txns
-    if t.get("type", "").strip().lower() == "credit"
-    )
-    month_expenses = sum(
-        t["amount"] for t in month_txns
-        if t.get("type", "").strip().lower() == "debit"
-    )
+    month_income = month_rollup["credit_total"]
+    month_expenses = month_rollup["debit_total"]
     month_savings = month_income - month_expenses
     month_savings_rate = round((month_savings / month_income) * 100, 2) if month_income else 0
 
@@ -86,14 +64,8 @@ def generate_financial_advice(request: Request):
     goals_ref = db.collection("users").document(user_id).collection("goals")
     goals_docs = goals_ref.stream()
     goals_raw = [doc.to_dict() | {"id": doc.id} for doc in goals_docs]
-    # Fetch goal contributions (auto allocated)
-    contrib_ref = db.collection("users").document(user_id).collection("goal_contributions")
-    contrib_docs = contrib_ref.stream()
-
-    auto_allocated_map = defaultdict(float)
-    for doc in contrib_docs:
-        data = doc.to_dict()
-        auto_allocated_map[data["goal_id"]] += data.get("allocated", 0)
+    # Auto allocations are kept on each goal document
+    auto_allocated_map = auto_allocated_totals(user_id, goals_raw)
     # Now enhance goal data with total allocation
     today = datetime.today()
     goals = []
@@ -123,19 +95,13 @@ def generate_financial_advice(request: Request):
     total_goal_required = min(total_goal_required, month_income)
 
     # Category-wise spending (Jan 1 to today)
-    category_map = {}
-    for t in txns:
-        if t["type"] == "debit":
-            cat = t["category"]
-            category_map[cat] = category_map.get(cat, 0) + t["amount"]
-    category_spending = [{"name": k, "amount": v} for k, v in category_map.items()]
+    category_spending = [
+        {"name": cat, "amount": totals["debit"]}
+        for cat, totals in sorted(year_totals["categories"].items()) if totals["debit"]
+    ]
 
     # Notable transactions (top 3)
-    large_txns = sorted(
-        [t for t in txns if t["type"] == "debit"],
-        key=lambda x: x["amount"],
-        reverse=True
-    )[:3]
+    large_txns = year_totals["largest_debits"][:3]
 
     # Construct prompt inline
     goals_text = "\n".join([
@@ -314,21 +280,57 @@ This Month's Performance:
 ---
 {instructions_block}
 """
-   
+    return prompt
 
-    try:
-        res = model.generate_content(prompt)
-        advice_text = res.text.strip()
-        advice_text = re.sub(r"^```json|```$", "", advice_text).strip()
-        advice = json.loads(advice_text)
 
-        db.collection("users").document(user_id).collection("advice").document("latest").set({
-            "insights": advice.get("insights", []),
-            "monthly_health": advice.get("monthly_health", {}),
-            "updated_at": datetime.utcnow().isoformat()
-        })
+def advice_fingerprint(prompt: str) -> str:
+    # The prompt carries every computed input (totals, categories, goal states), so
+    # hashing it with the model name also catches changes to the prompt itself
+    return hashlib.sha256(f"{ADVICE_MODEL}\n{prompt}".encode("utf-8")).hexdigest()
+
+
+def save_advice(user_id: str, advice: dict, input_hash: str):
+    db.collection("users").document(user_id).collection("advice").document("latest").set({
+        "insights": advice.get("insights", []),
+        "monthly_health": advice.get("monthly_health", {}),
+        "input_hash": input_hash,
+        "updated_at": datetime.utcnow().isoformat()
+    })
+
+
+def generate_advice(user_id: str, force: bool = False, generator=None):
+    """Generate and save a user's advice; returns (advice, cached).
+
+    generator stands in for the Gemini model (anything with
+    generate_content), e.g. a rate-limited or stub model.
+    """
+    prompt = build_advice_prompt(user_id)
+    input_hash = advice_fingerprint(prompt)
 
-        return {"success": True, "advice_json": advice}
+    # Nothing the model would see has changed since the stored advice was generated
+    if not force:
+        latest = load_latest_advice(user_id)
+        if latest.get("input_hash") == input_hash:
+            return {"insights": latest["insights"], "monthly_health": latest["monthly_health"]}, True
+
+    res = (generator or model).generate_content(prompt)
+    advice_text = res.text.strip()
+    advice_text = re.sub(r"^```json|```$", "", advice_text).strip()
+    advice = json.loads(advice_text)
+
+    save_advice(user_id, advice, input_hash)
+    return advice, False
+
+
+@router.post("/financial-advice/generate")
+def generate_financial_advice(request: Request, force: bool = Query(False)):
+    user_id = verify_firebase_token(request)
+    if not user_id:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+
+    try:
+        advice, cached = generate_advice(user_id, force=force)
+        return {"success": True, "advice_json": advice, "cached": cached}
 
     except json.JSONDecodeError as e:
         raise HTTPException(status_code=500, detail=f"Gemini response was not valid JSON: {e}")
@@ -337,12 +339,102 @@ This Month's Performance:
         raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
     
 
+# Recent streamed generations, for /metrics/cache
+STREAM_TIMINGS_KEPT = 200
+stream_timings = deque(maxlen=STREAM_TIMINGS_KEPT)
+stream_timings_lock = threading.Lock()
+
+
+def stream_timing_stats() -> dict:
+    with stream_timings_lock:
+        timings = list(stream_timings)
+    first = sorted(t["time_to_first_insight_ms"] for t in timings if t["time_to_first_insight_ms"] is not None)
+    total = sorted(t["total_ms"] for t in timings)
+    return {
+        "streams": len(timings),
+        "p50_time_to_first_insight_ms": first[len(first) // 2] if first else None,
+        "p50_total_ms": total[len(total) // 2] if total else None,
+    }
+
+
+@router.post("/financial-advice/generate/stream")
+def stream_financial_advice(request: Request, force: bool = Query(False)):
+    user_id = verify_firebase_token(request)
+    if not user_id:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+
+    prompt = build_advice_prompt(user_id)
+    return StreamingResponse(
+        advice_events(user_id, prompt, advice_fingerprint(prompt), force),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def advice_events(user_id: str, prompt: str, input_hash: str, force: bool = False):
+    """SSE events: one "insight" per insight, then "monthly_health", then "done".
+
+    Insights are sent as soon as Gemini finishes each one; the complete
+    document is parsed and saved exactly like the blocking endpoint.
+    """
+    if not force:
+        latest = load_latest_advice(user_id)
+        if latest.get("input_hash") == input_hash:
+            for insight in latest["insights"]:
+                yield sse_event("insight", insight)
+            yield sse_event("monthly_health", latest["monthly_health"])
+            yield sse_event("done", {"cached": True, "insights": len(latest["insights"])})
+            return
+
+    started = time.perf_counter()
+    first_insight_ms = None
+    insight_count = 0
+    parser = AdviceStreamParser()
+    try:
+        for chunk in model.generate_content(prompt, stream=True):
+            for event, value in parser.feed(chunk.text):
+                # monthly_health goes out last, after the full document checks out
+                if event != "insight":
+                    continue
+                if first_insight_ms is None:
+                    first_insight_ms = round((time.perf_counter() - started) * 1000)
+                insight_count += 1
+                yield sse_event("insight", value)
+
+        advice_text = re.sub(r"^```json|```$", "", parser.text.strip()).strip()
+        advice = json.loads(advice_text)
+        save_advice(user_id, advice, input_hash)
+    except json.JSONDecodeError as e:
+        yield sse_event("error", {"detail": f"Gemini response was not valid JSON: {e}"})
+        return
+    except Exception as e:
+        yield sse_event("error", {"detail": f"Unexpected error: {str(e)}"})
+        return
+
+    timing = {
+        "time_to_first_insight_ms": first_insight_ms,
+        "total_ms": round((time.perf_counter() - started) * 1000),
+    }
+    with stream_timings_lock:
+        stream_timings.append(timing)
+
+    yield sse_event("monthly_health", advice.get("monthly_health", {}))
+    yield sse_event("done", {"cached": False, "insights": insight_count, **timing})
+
+
 @router.get("/financial-advice")
 def get_financial_advice(request: Request):
     user_id = verify_firebase_token(request)
     if not user_id:
         raise HTTPException(status_code=401, detail="Unauthorized")
 
+    # Advice is versioned by its own document, so saving it leaves every other read's ETag alone
+    advice = load_latest_advice(user_id)
+    version = (advice.get("input_hash"), advice.get("updated_at"))
+    return conditional_response(request, user_id, "financial-advice", {}, lambda: advice, cache=False, version=version)
+
+
+def load_latest_advice(user_id: str):
     doc = db.collection("users").document(user_id).collection("advice").document("latest").get()
     if doc.exists:
         return doc.to_dict()
@@ -1,8 +1,11 @@
 from fastapi import APIRouter, Request, Query, HTTPException
 from datetime import datetime, timedelta
 from dateutil.relativedelta import relativedelta
-from firebase_config import db, verify_firebase_token
+from firebase_config import verify_firebase_token
 from calendar import month_name
+from rollups import RollupWindows, load_rollups
+from response_cache import conditional_response
+from transaction_reads import stream_transactions, ROLLUP_FIELDS
 
 router = APIRouter()
 
@@ -11,6 +14,12 @@ def get_financial_insights(request: Request, period: str = Query("monthly")):
     uid = verify_firebase_token(request)
     period = period.strip().lower()
 
+    # Windows are relative to today, so the date is part of the cache key
+    params = {"period": period, "today": str(datetime.utcnow().date())}
+    return conditional_response(request, uid, "financial-insights", params, lambda: compute_financial_insights(uid, period))
+
+
+def compute_financial_insights(uid: str, period: str):
     def get_date_ranges(period):
         today = datetime.utcnow().date()
 
@@ -39,23 +48,25 @@ def get_financial_insights(request: Request, period: str = Query("monthly")):
 
     today, current_start, current_end, previous_start, previous_end = get_date_ranges(period)
 
-    def get_transactions(start_date, end_date):
-        txs = db.collection("users").document(uid).collection("transactions") \
-            .where("date", ">=", str(start_date)) \
-            .where("date", "<", str(end_date)) \
-            .stream()
-        return [t.to_dict() for t in txs]
+    # Health score periods
+    health_3_start = today - relativedelta(months=3)
+    health_6_start = today - relativedelta(months=6)
+    trend_periods = get_trend_periods(period, current_end)
+
+    # Whole months come from the monthly rollups; only edge months read raw rows
+    def fetch_rows(start, end):
+        return list(stream_transactions(uid, ROLLUP_FIELDS, start, end))
 
-    def summarize(txns, tx_type):
-        return sum(float(t["amount"]) for t in txns if t.get("type") == tx_type)
+    windows = RollupWindows(load_rollups(uid), fetch_rows)
 
-    current_txns = get_transactions(current_start, current_end)
+    current = windows.aggregate(current_start, current_end)
+    previous = windows.aggregate(previous_start, previous_end)
     fallback_used = False
     fallback_period_label = ""
 
-    if not current_txns:
+    if not current["count"]:
         fallback_used = True
-        current_txns = get_transactions(previous_start, previous_end)
+        current = previous
         if period == "monthly":
             fallback_period_label = month_name[previous_start.month]
         elif period == "weekly":
@@ -63,113 +74,101 @@ def get_financial_insights(request: Request, period: str = Query("monthly")):
         elif period == "yearly":
             fallback_period_label = str(previous_start.year)
 
-    previous_txns = get_transactions(previous_start, previous_end)
+    return {
+        "category_summary": compute_category_summary(current, previous),
+        "health_score_3_month": compute_health_score(windows.aggregate(health_3_start, today)),
+        "health_score_6_month": compute_health_score(windows.aggregate(health_6_start, today)),
+        "spending_trends": compute_spending_trends(
+            current, previous, [windows.aggregate(p, e) for p, e in trend_periods]
+        ),
+        "fallback": fallback_used,
+        "fallback_label": fallback_period_label
+    }
 
-    # Health score periods
-    health_3_start = today - relativedelta(months=3)
-    health_6_start = today - relativedelta(months=6)
-    health_3_txns = get_transactions(health_3_start, today)
-    health_6_txns = get_transactions(health_6_start, today)
-
-    def compute_category_summary(txns_curr, txns_prev):
-        def summarize_by_category(txns):
-            category_totals = {}
-            total = 0
-            for t in txns:
-                if t.get("type") != "debit":
-                    continue
-                cat = t.get("category", "Others")
-                amt = float(t.get("amount", 0))
-                category_totals[cat] = category_totals.get(cat, 0) + amt
-                total += amt
-            return category_totals, total
-
-        curr_map, curr_total = summarize_by_category(txns_curr)
-        prev_map, prev_total = summarize_by_category(txns_prev)
-
-        summary = []
-        for cat, amt in curr_map.items():
-            curr_pct = (amt / curr_total * 100) if curr_total else 0
-            prev_pct = (prev_map.get(cat, 0) / prev_total * 100) if prev_total else 0
-            summary.append({
-                "name": cat,
-                "amount": round(amt, 2),
-                "percent": round(curr_pct, 1),
-                "change": round(curr_pct - prev_pct, 1)
-            })
-        return summary
-
-    def compute_health_score(txns):
-        income = summarize(txns, "credit")
-        expense = summarize(txns, "debit")
-        savings = income - expense
-
-        savings_rate = ((savings / income) * 100) if income else 0
-        debt_to_income = ((expense / income) * 100) if income else 0
-
-        avg_monthly_exp = expense / 3 if expense else 0
-        emergency_fund_months = savings / avg_monthly_exp if avg_monthly_exp else 0
-
-        score = 50
-        if savings_rate >= 20:
-            score += 20
-        elif savings_rate >= 10:
-            score += 10
-        if expense < income:
-            score += 10
-
-        return {
-            "score": min(100, max(0, round(score))),
-            "savings_rate": round(savings_rate, 1),
-            "debt_to_income": round(debt_to_income, 1),
-            "emergency_fund_months": round(emergency_fund_months, 1)
-        }
 
-    def compute_spending_trends(curr_txns, prev_txns, period, now):
-        curr_spend = summarize(curr_txns, "debit")
-        prev_spend = summarize(prev_txns, "debit")
-        diff = curr_spend - prev_spend
-        percent_change = (diff / prev_spend * 100) if prev_spend else 0
+def get_trend_periods(period, now):
+    if period == "weekly":
+        starts = [now - timedelta(days=7 * (i + 1)) for i in range(6)]
+        return [(p, p + timedelta(days=7)) for p in starts]
+    elif period == "monthly":
+        starts = [(now - relativedelta(months=i)).replace(day=1) for i in range(6)]
+        return [(p, p + relativedelta(months=1)) for p in starts]
+    elif period == "yearly":
+        starts = [(now - relativedelta(years=i)).replace(month=1, day=1) for i in range(6)]
+        return [(p, p + relativedelta(years=1)) for p in starts]
+    return []
 
-        if period == "weekly":
-            periods = [now - timedelta(days=7 * (i + 1)) for i in range(6)]
-            avg_spend = sum(
-                summarize(get_transactions(p, p + timedelta(days=7)), "debit") for p in periods
-            ) / 6
-        elif period == "monthly":
-            periods = [(now - relativedelta(months=i)).replace(day=1) for i in range(6)]
-            avg_spend = sum(
-                summarize(get_transactions(p, p + relativedelta(months=1)), "debit") for p in periods
-            ) / 6
-        elif period == "yearly":
-            periods = [(now - relativedelta(years=i)).replace(month=1, day=1) for i in range(6)]
-            avg_spend = sum(
-                summarize(get_transactions(p, p + relativedelta(years=1)), "debit") for p in periods
-            ) / 6
-        else:
-            avg_spend = 0
-
-        largest = max(
-            (t for t in curr_txns if t["type"] == "debit"),
-            key=lambda x: float(x.get("amount", 0)),
-            default=None
-        )
-
-        return {
-            "diff": round(diff),
-            "percent_change": round(percent_change, 1),
-            "average_spend": round(avg_spend),
-            "largest_expense": {
-                "amount": round(float(largest.get("amount", 0))) if largest else 0,
-                "title": largest.get("title", "N/A") if largest else "N/A"
-            }
-        }
+
+def summarize_by_category(window):
+    category_totals = {
+        cat: totals["debit"] for cat, totals in window["categories"].items() if totals["debit"]
+    }
+    return category_totals, window["debit_total"]
+
+
+def compute_category_summary(window_curr, window_prev):
+    curr_map, curr_total = summarize_by_category(window_curr)
+    prev_map, prev_total = summarize_by_category(window_prev)
+
+    summary = []
+    for cat, amt in curr_map.items():
+        curr_pct = (amt / curr_total * 100) if curr_total else 0
+        prev_pct = (prev_map.get(cat, 0) / prev_total * 100) if prev_total else 0
+        summary.append({
+            "name": cat,
+            "amount": round(amt, 2),
+            "percent": round(curr_pct, 1),
+            "change": round(curr_pct - prev_pct, 1)
+        })
+    return summary
+
+
+def compute_health_score(window):
+    income = window["credit_total"]
+    expense = window["debit_total"]
+    savings = income - expense
+
+    savings_rate = ((savings / income) * 100) if income else 0
+    debt_to_income = ((expense / income) * 100) if income else 0
+
+    avg_monthly_exp = expense / 3 if expense else 0
+    emergency_fund_months = savings / avg_monthly_exp if avg_monthly_exp else 0
+
+    score = 50
+    if savings_rate >= 20:
+        score += 20
+    elif savings_rate >= 10:
+        score += 10
+    if expense < income:
+        score += 10
 
     return {
-        "category_summary": compute_category_summary(current_txns, previous_txns),
-        "health_score_3_month": compute_health_score(health_3_txns),
-        "health_score_6_month": compute_health_score(health_6_txns),
-        "spending_trends": compute_spending_trends(current_txns, previous_txns, period, current_end),
-        "fallback": fallback_used,
-        "fallback_label": fallback_period_label
+        "score": min(100, max(0, round(score))),
+        "savings_rate": round(savings_rate, 1),
+        "debt_to_income": round(debt_to_income, 1),
+        "emergency_fund_months": round(emergency_fund_months, 1)
+    }
+
+
+def compute_spending_trends(window_curr, window_prev, trend_windows):
+    curr_spend = window_curr["debit_total"]
+    prev_spend = window_prev["debit_total"]
+    diff = curr_spend - prev_spend
+    percent_change = (diff / prev_spend * 100) if prev_spend else 0
+
+    if trend_windows:
+        avg_spend = sum(w["debit_total"] for w in trend_windows) / 6
+    else:
+        avg_spend = 0
+
+    largest = window_curr["largest_debits"][0] if window_curr["largest_debits"] else None
+
+    return {
+        "diff": round(diff),
+        "percent_change": round(percent_change, 1),
+        "average_spend": round(avg_spend),
+        "largest_expense": {
+            "amount": round(float(largest.get("amount", 0))) if largest else 0,
+            "title": largest.get("title", "N/A") if largest else "N/A"
+        }
     }
@@ -13,6 +13,11 @@ def initialize_firebase():
     if firebase_admin._apps:
         return
 
+    if os.getenv("FIRESTORE_EMULATOR_HOST"):
+        # Local emulator runs need no service account
+        firebase_admin.initialize_app(options={"projectId": os.getenv("GCLOUD_PROJECT", "demo-financetracker")})
+        return
+
     raw_json = os.getenv("FIREBASE_CREDENTIAL_JSON")  # Azure
     file_path = os.getenv("FIREBASE_CREDENTIAL_PATH", "Backend/firebase-credentials.json")  # Local fallback
     
@@ -0,0 +1,223 @@
+import base64
+import time
+from datetime import datetime
+from firebase_config import db
+from batch_writer import commit_in_batches
+from ingestion import ingest_statement, StatementIngestionError, ExtractionIncompleteError
+
+# Gmail recommends at most 50 calls per batch request
+GMAIL_BATCH_SIZE = 50
+STATEMENT_QUERY = 'subject:Account Statement has:attachment'
+# Window for the first sync, before a watermark exists
+INITIAL_SYNC_WINDOW = 'newer_than:6d'
+# Rejections that the same PDF can never get past; missing months can be filled in later
+PERMANENT_REJECTIONS = {"duplicate_months", "no_months"}
+# Re-list a little before the watermark to cover clock skew; the ledger drops repeats
+WATERMARK_OVERLAP_SECONDS = 3600
+
+
+def extract_pdf_parts(payload):
+    pdf_parts = []
+    parts = payload.get("parts", [])
+    for part in parts:
+        if part.get("filename", "").endswith(".pdf") and part["body"].get("attachmentId"):
+            pdf_parts.append(part)
+        elif part.get("parts"):
+            pdf_parts += extract_pdf_parts(part)
+    return pdf_parts
+
+
+def execute_batched(service, api_requests):
+    """Run Gmail API requests through batch HTTP calls.
+
+    Returns one (response, error) pair per request, in request order.
+    """
+    results = [(None, None)] * len(api_requests)
+
+    for offset in range(0, len(api_requests), GMAIL_BATCH_SIZE):
+        chunk = api_requests[offset:offset + GMAIL_BATCH_SIZE]
+
+        def callback(request_id, response, exception):
+            results[int(request_id)] = (response, exception)
+
+        batch = service.new_batch_http_request(callback=callback)
+        for i, api_request in enumerate(chunk):
+            batch.add(api_request, request_id=str(offset + i))
+        try:
+            batch.execute()
+        except Exception as e:
+            for i in range(offset, offset + len(chunk)):
+                if results[i] == (None, None):
+                    results[i] = (None, e)
+
+    return results
+
+
+def gmail_settings_ref(user_id: str):
+    return db.collection("users").document(user_id).collection("gmail").document("latest")
+
+
+def ingested_ledger_ref(user_id: str):
+    return db.collection("users").document(user_id).collection("gmail_ingested")
+
+
+def ledger_key(attachment: dict) -> str:
+    # Gmail attachment IDs change between fetches; the part ID does not
+    return f"{attachment['message_id']}_{attachment['part_id']}"
+
+
+def build_sync_query(watermark):
+    if watermark:
+        return f"{STATEMENT_QUERY} after:{int(watermark) - WATERMARK_OVERLAP_SECONDS}"
+    return f"{STATEMENT_QUERY} {INITIAL_SYNC_WINDOW}"
+
+
+def filter_already_ingested(user_id: str, attachments):
+    if not attachments:
+        return attachments, 0
+    ledger_ref = ingested_ledger_ref(user_id)
+    refs = [ledger_ref.document(ledger_key(a)) for a in attachments]
+    seen = {doc.id for doc in db.get_all(refs) if doc.exists}
+    fresh = [a for a in attachments if ledger_key(a) not in seen]
+    return fresh, len(attachments) - len(fresh)
+
+
+def list_statement_messages(service, query: str = STATEMENT_QUERY):
+    messages = []
+    page_token = None
+    while True:
+        response = service.users().messages().list(userId='me', q=query, pageToken=page_token).execute()
+        messages += response.get('messages', [])
+        page_token = response.get('nextPageToken')
+        if not page_token:
+            return messages
+
+
+def fetch_statement_attachments(service, message_ids, skip=None):
+    """Fetch every PDF attachment for the given messages, oldest message first.
+
+    `skip` filters the attachment list before any attachment bodies are downloaded.
+    """
+    message_responses = execute_batched(
+        service,
+        [service.users().messages().get(userId='me', id=msg_id) for msg_id in message_ids]
+    )
+
+    attachments = []
+    failures = []
+    for msg_id, (msg_data, error) in zip(message_ids, message_responses):
+        if error:
+            failures.append({"message_id": msg_id, "status": "failed", "detail": str(error)})
+            continue
+        for part in extract_pdf_parts(msg_data.get("payload", {})):
+            attachments.append({
+                "message_id": msg_id,
+                "attachment_id": part['body']['attachmentId'],
+                "part_id": part.get('partId', part['filename']),
+                "filename": part['filename'],
+                "internal_date": int(msg_data.get("internalDate", 0)),
+            })
+
+    # Statements go in oldest first so month continuity checks see them in order
+    attachments.sort(key=lambda a: a["internal_date"])
+    if skip:
+        attachments = skip(attachments)
+
+    attachment_responses = execute_batched(
+        service,
+        [
+            service.users().messages().attachments().get(
+                userId='me', messageId=a["message_id"], id=a["attachment_id"])
+            for a in attachments
+        ]
+    )
+    for attachment, (data, error) in zip(attachments, attachment_responses):
+        if error:
+            attachment["error"] = str(error)
+        else:
+            attachment["data"] = base64.urlsafe_b64decode(data['data'])
+
+    return attachments, failures
+
+
+def ingest_attachment(user_id: str, attachment: dict, pdf_password: str):
+    result = {
+        "message_id": attachment["message_id"],
+        "attachment_id": attachment["attachment_id"],
+        "filename": attachment["filename"],
+    }
+    if "error" in attachment:
+        return result | {"status": "failed", "detail": attachment["error"]}
+
+    try:
+        outcome = ingest_statement(user_id, attachment["data"], password=pdf_password, check_continuity=True)
+    except ExtractionIncompleteError as e:
+        return result | {"status": "failed", "detail": str(e)}
+    except StatementIngestionError as e:
+        return result | {"status": "failed", "detail": str(e), "pdf_error": True}
+    except Exception as e:
+        return result | {"status": "failed", "detail": str(e)}
+
+    if outcome.get("status") == "error":
+        return result | {"status": "rejected", "reason": outcome.get("reason"), "detail": outcome.get("warning")}
+    return result | {"status": "ingested", "detail": outcome.get("message")}
+
+
+def sync_statements(user_id: str, service, pdf_password: str, watermark=None):
+    sync_started = int(time.time())
+    skipped = 0
+
+    def skip_ingested(attachments):
+        nonlocal skipped
+        attachments, skipped = filter_already_ingested(user_id, attachments)
+        return attachments
+
+    messages = list_statement_messages(service, build_sync_query(watermark))
+    attachments, results = fetch_statement_attachments(service, [m['id'] for m in messages], skip=skip_ingested)
+
+    # Ingestion runs in-process and sequentially, since each statement's checks depend on the last
+    ledger_writes = []
+    retry_from = None
+    for attachment in attachments:
+        result = ingest_attachment(user_id, attachment, pdf_password)
+        results.append(result)
+        attachment.pop("data", None)
+
+        # Settled attachments go in the ledger so they are never fetched or parsed again
+        if result["status"] == "ingested" or result.get("reason") in PERMANENT_REJECTIONS:
+            ledger_writes.append((ingested_ledger_ref(user_id).document(ledger_key(attachment)), {
+                "message_id": attachment["message_id"],
+                "part_id": attachment["part_id"],
+                "filename": attachment["filename"],
+                "internal_date": attachment["internal_date"],
+                "status": result["status"],
+                "detail": result.get("detail"),
+                "recorded_at": datetime.utcnow().isoformat(),
+            }))
+        elif retry_from is None:
+            # Keep the watermark behind anything that still needs another attempt
+            retry_from = attachment["internal_date"] // 1000
+
+    commit_in_batches(ledger_writes)
+
+    if any(r["status"] == "failed" and "attachment_id" not in r for r in results):
+        # A message could not be read at all; retry the whole window next time
+        new_watermark = watermark
+    elif retry_from is not None:
+        new_watermark = retry_from
+    else:
+        new_watermark = sync_started
+
+    settings_update = {
+        "last_gmail_sync": datetime.utcnow().isoformat(),
+        "sync_watermark": new_watermark,
+    }
+    if any(r.get("pdf_error") for r in results):
+        settings_update["pdf_password_valid"] = False
+    gmail_settings_ref(user_id).update(settings_update)
+
+    return {
+        "synced_pdfs": sum(1 for r in results if r["status"] == "ingested"),
+        "skipped_already_ingested": skipped,
+        "results": results,
+    }
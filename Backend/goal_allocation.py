@@ -0,0 +1,135 @@
+from collections import defaultdict
+from datetime import datetime
+import numpy as np
+from firebase_config import db
+from batch_writer import commit_in_batches
+from rollups import load_rollups, monthly_savings_from_rollups
+from transaction_reads import CONTRIBUTION_FIELDS, GOAL_ALLOCATION_FIELDS
+
+# goal_contributions/{goal_id}_{YYYY-MM} holds one goal's auto allocation for one month.
+# The whole month x goal matrix is recomputed for the affected months and written
+# in one batched commit; each goal's auto_allocated_total is then rewritten from them.
+
+
+def parse_created_at(value) -> datetime:
+    try:
+        created_at = datetime.fromisoformat(value or "1970-01-01T00:00:00")
+    except (TypeError, ValueError):
+        return datetime.min
+    return created_at.replace(tzinfo=None)
+
+
+def month_start(month: str) -> datetime:
+    return datetime.strptime(month + "-01", "%Y-%m-%d")
+
+
+def load_allocation_goals(uid: str):
+    goals_ref = db.collection("users").document(uid).collection("goals")
+    goals = []
+    for doc in goals_ref.select(GOAL_ALLOCATION_FIELDS).stream():
+        data = doc.to_dict()
+        data["id"] = doc.id
+        data["created_at"] = parse_created_at(data.get("created_at"))
+        goals.append(data)
+    return goals
+
+
+def allocation_matrix(goals, savings_by_month: dict):
+    """Allocate each month's savings across goals.
+
+    Returns (months, eligible, allocated) where the last two are
+    len(months) x len(goals) arrays. A goal takes part in a month that
+    starts after it was created. Manual goals get their fixed amount, capped
+    by the month's savings; what is left after all manual amounts is split
+    across the other goals pro rata by target. Months without positive
+    savings are left out.
+    """
+    months = sorted(m for m, s in savings_by_month.items() if s > 0)
+    shape = (len(months), len(goals))
+    if not months or not goals:
+        return months, np.zeros(shape, dtype=bool), np.zeros(shape)
+
+    savings = np.array([savings_by_month[m] for m in months], dtype=np.float64)
+    starts = np.array(months, dtype="datetime64[M]").astype("datetime64[us]")
+    created = np.array([g["created_at"] for g in goals], dtype="datetime64[us]")
+    manual = np.array([g.get("manual_allocated") or 0 for g in goals], dtype=np.float64)
+    target = np.array([g.get("target_amount") or 0 for g in goals], dtype=np.float64)
+    is_manual = manual != 0
+
+    eligible = created[None, :] <= starts[:, None]
+    leftover = savings - np.minimum((eligible * manual).sum(axis=1), savings)
+
+    auto_target = eligible & ~is_manual
+    auto_total = (auto_target * target).sum(axis=1, keepdims=True)
+    share = np.divide(auto_target * target, auto_total, out=np.zeros(shape), where=auto_total != 0)
+
+    allocated = np.where(
+        is_manual,
+        np.minimum(manual[None, :], savings[:, None]),
+        np.round(leftover[:, None] * share),
+    )
+    return months, eligible, np.where(eligible, allocated, 0)
+
+
+def allocation_records(goals, months, eligible, allocated) -> dict:
+    timestamp = datetime.utcnow().isoformat()
+    records = {}
+    for m, g in zip(*np.nonzero(eligible)):
+        goal = goals[g]
+        amount = float(allocated[m, g]) if goal.get("manual_allocated") else int(allocated[m, g])
+        records[f"{goal['id']}_{months[m]}"] = {
+            "goal_id": goal["id"],
+            "allocated": amount,
+            "month": months[m],
+            "source": "auto",
+            "timestamp": timestamp,
+        }
+    return records
+
+
+def reallocate_months(uid: str, months=None, since: datetime = None):
+    """Recompute goal contributions for the given months (all by default).
+
+    since limits the work to months starting on or after that time, which
+    is where a goal created then can have contributions at all.
+    """
+    savings = monthly_savings_from_rollups(load_rollups(uid))
+    affected = set(savings) if months is None else set(months)
+    if since is not None:
+        affected = {m for m in affected if month_start(m) >= since}
+    if not affected:
+        return None
+
+    goals = load_allocation_goals(uid)
+    records = allocation_records(goals, *allocation_matrix(goals, {m: savings.get(m, 0) for m in affected}))
+
+    contrib_ref = db.collection("users").document(uid).collection("goal_contributions")
+    existing = {}
+    for doc in contrib_ref.where("month", ">=", min(affected)).select(CONTRIBUTION_FIELDS + ["month"]).stream():
+        data = doc.to_dict()
+        if data.get("month") in affected:
+            existing[doc.id] = data
+
+    writes = [(contrib_ref.document(doc_id), record) for doc_id, record in records.items()]
+    writes += [(contrib_ref.document(doc_id), None) for doc_id in existing if doc_id not in records]
+    result = commit_in_batches(writes, merge=True)
+
+    # Totals are rewritten from what is stored rather than incremented, so overlapping
+    # reallocations (an upload job and a goal edit) converge instead of drifting
+    totals = contribution_totals(uid)
+    goals_ref = db.collection("users").document(uid).collection("goals")
+    commit_in_batches(
+        [(goals_ref.document(g["id"]), {"auto_allocated_total": totals.get(g["id"], 0)}) for g in goals],
+        merge=True,
+    )
+    return result
+
+
+def contribution_totals(uid: str) -> dict:
+    contrib_ref = db.collection("users").document(uid).collection("goal_contributions")
+    totals = defaultdict(float)
+    for doc in contrib_ref.select(CONTRIBUTION_FIELDS).stream():
+        data = doc.to_dict()
+        if data.get("goal_id"):
+            totals[data["goal_id"]] += data.get("allocated", 0)
+    return totals
@@ -0,0 +1,94 @@
+import numpy as np
+
+FORECAST_PATHS = 10_000
+FORECAST_HORIZON_MONTHS = 120
+FORECAST_HISTORY_MONTHS = 24
+FORECAST_SEED = 20240601
+
+
+def add_months(month: str, n: int) -> str:
+    return str(np.datetime64(month, "M") + n)
+
+
+def month_end(month: str) -> str:
+    return str(np.datetime64(month, "M") + 1 - np.timedelta64(1, "D"))
+
+
+def simulate_completion(history, goals, paths: int = FORECAST_PATHS, horizon: int = FORECAST_HORIZON_MONTHS, seed=FORECAST_SEED):
+    """Months until each goal is funded, per simulated path.
+
+    Each path draws monthly savings with replacement from history and splits
+    every month the way goal allocation does: manual goals take their fixed
+    amount capped by the month's savings, the rest is shared pro rata by
+    target, and months without positive savings allocate nothing. Returns a
+    paths x len(goals) int array; 1 means funded by the end of the first
+    simulated month, horizon + 1 means not funded within the horizon.
+    """
+    rng = np.random.default_rng(seed)
+    savings = rng.choice(np.asarray(history, dtype=np.float64), size=(paths, horizon))
+    savings = np.maximum(savings, 0)
+
+    manual = np.array([g.get("manual_allocated") or 0 for g in goals], dtype=np.float64)
+    target = np.array([g.get("target_amount") or 0 for g in goals], dtype=np.float64)
+    remaining = target - np.array([g.get("allocated") or 0 for g in goals], dtype=np.float64)
+    is_manual = manual != 0
+
+    leftover = savings - np.minimum(manual.sum(), savings)
+    auto_total = target[~is_manual].sum()
+
+    # Every auto goal gets a fixed share of the same leftover, and manual goals with the
+    # same amount get the same series, so each distinct running total is built once
+    running = {}
+
+    def running_total(key, monthly):
+        if key not in running:
+            running[key] = np.cumsum(monthly(), axis=1)
+        return running[key]
+
+    months = np.zeros((paths, len(goals)), dtype=np.int32)
+    for g in range(len(goals)):
+        if remaining[g] <= 0:
+            continue
+        if is_manual[g]:
+            cumulative = running_total(("manual", manual[g]), lambda: np.minimum(manual[g], savings))
+            needed = remaining[g]
+        elif auto_total and target[g] > 0:
+            cumulative = running_total("auto", lambda: leftover)
+            needed = remaining[g] * auto_total / target[g]
+        else:
+            months[:, g] = horizon + 1
+            continue
+        # Running totals never decrease, so the months still short of the goal come first;
+        # a path that never gets there counts all horizon months and lands on horizon + 1
+        months[:, g] = np.count_nonzero(cumulative < needed, axis=1) + 1
+    return months
+
+
+def forecast_goals(history, goals, start_month: str, paths: int = FORECAST_PATHS, horizon: int = FORECAST_HORIZON_MONTHS, seed=FORECAST_SEED):
+    """P10/P50/P90 finish dates and on-time probability for each goal.
+
+    start_month ("YYYY-MM") is the first month whose savings are simulated.
+    A percentile beyond the horizon, or of an already funded goal, is None.
+    """
+    if not goals:
+        return []
+    if not len(history):
+        return [{"goal_id": g["id"], "funded": False, "on_time_probability": None, "finish_dates": None} for g in goals]
+
+    months = simulate_completion(history, goals, paths, horizon, seed)
+    forecasts = []
+    for g, goal in enumerate(goals):
+        column = months[:, g]
+        deadline_index = (np.datetime64(goal["deadline"][:7], "M") - np.datetime64(start_month, "M")).astype(int) + 1
+        funded = bool((column == 0).all())
+        finish_dates = {}
+        for label, q in (("p10", 10), ("p50", 50), ("p90", 90)):
+            k = int(np.percentile(column, q, method="inverted_cdf"))
+            finish_dates[label] = month_end(add_months(start_month, k - 1)) if 0 < k <= horizon else None
+        forecasts.append({
+            "goal_id": goal["id"],
+            "funded": funded,
+            "on_time_probability": round(float(np.mean(column <= deadline_index)), 4),
+            "finish_dates": finish_dates,
+        })
+    return forecasts
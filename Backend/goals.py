@@ -1,10 +1,15 @@
-from fastapi import APIRouter, Request, HTTPException
+from fastapi import APIRouter, Request, HTTPException, Query
 from pydantic import BaseModel
 from uuid import uuid4
 from firebase_admin import firestore
 from datetime import datetime
 from firebase_config import verify_firebase_token
-from collections import defaultdict
+from batch_writer import commit_in_batches
+from data_version import bump_data_version
+from goal_allocation import reallocate_months, parse_created_at, contribution_totals
+from goal_forecast import forecast_goals, add_months, FORECAST_PATHS, FORECAST_HISTORY_MONTHS
+from rollups import load_rollups, monthly_savings_from_rollups
+from response_cache import conditional_response
 
 router = APIRouter()
 db = firestore.client()
@@ -25,10 +30,13 @@ def add_goal(request: Request, goal: GoalInput):
     goal_id = str(uuid4())
     goal_data = {
         **goal.dict(),
+        "auto_allocated_total": 0,
         "created_at": datetime.utcnow().isoformat()
     }
 
     db.collection("users").document(uid).collection("goals").document(goal_id).set(goal_data)
+    reallocate_months(uid, since=parse_created_at(goal_data["created_at"]))
+    bump_data_version(uid)
     return {"message": "Goal added", "goal_id": goal_id}
 
 
@@ -39,10 +47,14 @@ def edit_goal(goal_id: str, request: Request, goal: GoalInput):
         raise HTTPException(status_code=401, detail="Missing user ID")
 
     goal_ref = db.collection("users").document(uid).collection("goals").document(goal_id)
-    if not goal_ref.get().exists:
+    snapshot = goal_ref.get()
+    if not snapshot.exists:
         raise HTTPException(status_code=404, detail="Goal not found")
 
     goal_ref.update(goal.dict())
+    # Shares move in every month the goal takes part in
+    reallocate_months(uid, since=parse_created_at(snapshot.to_dict().get("created_at")))
+    bump_data_version(uid)
     return {"message": "Goal updated"}
 
 
@@ -53,10 +65,14 @@ def delete_goal(goal_id: str, request: Request):
         raise HTTPException(status_code=401, detail="Missing user ID")
 
     goal_ref = db.collection("users").document(uid).collection("goals").document(goal_id)
-    if not goal_ref.get().exists:
+    snapshot = goal_ref.get()
+    if not snapshot.exists:
         raise HTTPException(status_code=404, detail="Goal not found")
 
     goal_ref.delete()
+    # Drops the goal's contributions and hands its share back to the others
+    reallocate_months(uid, since=parse_created_at(snapshot.to_dict().get("created_at")))
+    bump_data_version(uid)
     return {"message": "Goal deleted"}
 
 
@@ -73,6 +89,12 @@ def get_goals_with_progress(request: Request):
     if not uid:
         raise HTTPException(status_code=401, detail="Missing user ID")
 
+    # months_left moves with the calendar, so the date is part of the ETag
+    params = {"today": datetime.today().date().isoformat()}
+    return conditional_response(request, uid, "goals", params, lambda: load_goals_with_progress(uid))
+
+
+def load_goals_with_progress(uid: str):
     # Fetch goals
     goals_ref = db.collection("users").document(uid).collection("goals")
     goals_docs = goals_ref.stream()
@@ -81,25 +103,12 @@ def get_goals_with_progress(request: Request):
     if not goals:
         return {"goals": []}
 
-    # Fetch all goal contributions
-    contrib_ref = db.collection("users").document(uid).collection("goal_contributions")
-    contrib_docs = contrib_ref.stream()
-
-    goal_contrib_totals = defaultdict(float)
-    for doc in contrib_docs:
-        data = doc.to_dict()
-        goal_id = data.get("goal_id")
-        amount = data.get("allocated", 0)
-        if goal_id:
-            goal_contrib_totals[goal_id] += amount
+    auto_totals = auto_allocated_totals(uid, goals)
 
     # Enhance goals with progress data
     enhanced_goals = []
     for goal in goals:
-        # Fetch monthly auto allocations for this goal
-        contrib_ref = db.collection("users").document(uid).collection("goal_contributions")
-        contribs = contrib_ref.where("goal_id", "==", goal["id"]).stream()
-        auto_alloc_total = sum(doc.to_dict().get("allocated", 0) for doc in contribs)
+        auto_alloc_total = auto_totals.get(goal["id"], 0)
 
         manual_alloc = goal.get("manual_allocated") or 0
         allocated = manual_alloc + auto_alloc_total
@@ -121,95 +130,55 @@ def get_goals_with_progress(request: Request):
     return {"goals": enhanced_goals}
 
 
-def calculate_monthly_savings(transactions):
-    monthly = defaultdict(lambda: {"credit": 0, "debit": 0})
-    for txn in transactions:
-        try:
-            month = txn["date"][:7]  # e.g. "2024-06"
-            if txn["category"] == "Salary":
-                monthly[month]["credit"] += txn["amount"]
-            elif txn["type"] == "debit":
-                monthly[month]["debit"] += txn["amount"]
-        except:
-            continue
-
-    return {
-        month: credit_debit["credit"] - credit_debit["debit"]
-        for month, credit_debit in monthly.items()
-    }
-
-
-
-
-def auto_allocate_to_goals(user_id: str, savings_by_month: dict):
-    db = firestore.client()
-
-    # Fetch active goals
-    goals_ref = db.collection("users").document(user_id).collection("goals")
-    goals_docs = goals_ref.stream()
-    goals = []
-    for doc in goals_docs:
-        data = doc.to_dict()
-        try:
-            created_at = datetime.fromisoformat(data.get("created_at", "1970-01-01T00:00:00"))
-        except ValueError:
-            created_at = datetime.min  # fallback just in case
-       
-        data["id"] = doc.id
-        data["created_at"] = created_at
-        goals.append(data)
-
-    if not goals:
-
-        return
-
-    all_allocations = []
-
-    for month, savings in savings_by_month.items():
-        if savings <= 0:
-
-            continue
-
-        month_date = datetime.strptime(month + "-01", "%Y-%m-%d")
+@router.get("/goals/forecast")
+def forecast_goal_completion(request: Request, paths: int = Query(FORECAST_PATHS, ge=1000, le=100_000)):
+    uid = verify_firebase_token(request)
+    if not uid:
+        raise HTTPException(status_code=401, detail="Missing user ID")
 
-        eligible_goals = [g for g in goals if g["created_at"] <= month_date]
-        if not eligible_goals:
+    params = {"today": datetime.today().date().isoformat(), "paths": paths}
+    return conditional_response(request, uid, "goals-forecast", params, lambda: compute_goal_forecast(uid, paths))
 
-            continue
 
-        manual_alloc_total = sum(g.get("manual_allocated", 0) or 0 for g in eligible_goals)
-        capped_manual_alloc = min(manual_alloc_total, savings)
-        leftover_savings = savings - capped_manual_alloc
+def compute_goal_forecast(uid: str, paths: int = FORECAST_PATHS):
+    goals = load_goals_with_progress(uid)["goals"]
+    this_month = datetime.today().strftime("%Y-%m")
 
-        auto_goals = [g for g in eligible_goals if not g.get("manual_allocated")]
-        total_auto_target = sum(g["target_amount"] for g in auto_goals)
+    # The current month is still partial, so it is not part of the history
+    savings = monthly_savings_from_rollups(load_rollups(uid))
+    recorded = sorted(savings)
+    history_months = [m for m in recorded if m < this_month][-FORECAST_HISTORY_MONTHS:]
+    start_month = max(this_month, add_months(recorded[-1], 1)) if recorded else this_month
 
-        allocations = []
-        for goal in eligible_goals:
-            alloc = 0
-            if goal.get("manual_allocated"):
-                alloc = min(goal["manual_allocated"], savings)
-            else:
-                share = goal["target_amount"] / total_auto_target if total_auto_target else 0
-                alloc = round(leftover_savings * share)
+    forecasts = forecast_goals([savings[m] for m in history_months], goals, start_month, paths=paths)
+    by_id = {f.pop("goal_id"): f for f in forecasts}
+    return {
+        "start_month": start_month,
+        "history_months": len(history_months),
+        "paths": paths,
+        "goals": [
+            {"id": g["id"], "name": g.get("name"), "deadline": g["deadline"], **by_id[g["id"]]}
+            for g in goals
+        ],
+    }
 
-            record = {
-                "goal_id": goal["id"],
-                "allocated": alloc,
-                "month": month,
-                "source": "auto",
-                "timestamp": datetime.utcnow().isoformat(),
-            }
-            allocations.append(record)
 
-        # Save to goal_contributions collection
-        for record in allocations:
-            contrib_id = f"{record['goal_id']}_{month}"
-            db.collection("users") \
-            .document(user_id) \
-            .collection("goal_contributions") \
-            .document(contrib_id).set(record)
+def auto_allocated_totals(uid: str, goals) -> dict:
+    """Auto-allocated total per goal id, read from the goal documents.
 
-        all_allocations.extend(allocations)
+    Goals written before auto_allocated_total existed are summed from
+    goal_contributions in one pass and backfilled.
+    """
+    totals = {g["id"]: g["auto_allocated_total"] for g in goals if "auto_allocated_total" in g}
+    missing = [g["id"] for g in goals if "auto_allocated_total" not in g]
+    if not missing:
+        return totals
 
+    summed = contribution_totals(uid)
 
+    goals_ref = db.collection("users").document(uid).collection("goals")
+    commit_in_batches(
+        [(goals_ref.document(goal_id), {"auto_allocated_total": summed.get(goal_id, 0)}) for goal_id in missing],
+        merge=True,
+    )
+    return totals | {goal_id: summed.get(goal_id, 0) for goal_id in missing}
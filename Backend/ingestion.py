@@ -0,0 +1,159 @@
+from datetime import datetime
+from uuid import uuid4
+from firebase_config import db
+from extract_and_group import iter_pdf_lines, group_transactions_from_lines, extract_months_from_raw_blocks, split_fast_path
+from llm_prompt_builder import extract_transactions_concurrently
+from goal_allocation import reallocate_months
+from batch_writer import commit_in_batches, failed_chunks
+from month_ledger import get_existing_months, record_months
+from rollups import apply_transactions
+from data_version import bump_data_version
+from category_learning import LearningIndex, apply_learned_category, build_learning_map
+
+
+class StatementIngestionError(Exception):
+    pass
+
+
+class ExtractionIncompleteError(StatementIngestionError):
+    # Gemini chunks still failing after retries; nothing was stored, so the upload can be retried
+    pass
+
+
+def no_progress(stage: str, progress: int):
+    pass
+
+
+def find_missing_months(uploaded_months, existing_months):
+    # Combine uploaded + existing to check continuity
+    all_months = sorted(existing_months.union(set(uploaded_months)))
+    all_dts = [datetime.strptime(m, "%Y-%m") for m in all_months]
+    all_dts.sort()
+
+    expected = []
+    current = all_dts[0]
+    end = all_dts[-1]
+    while current < end:
+        current = current.replace(day=1)
+        current = datetime(current.year + (current.month // 12), (current.month % 12) + 1, 1)
+        expected.append(current.strftime("%Y-%m"))
+
+    return [m for m in expected if m not in uploaded_months and m not in existing_months]
+
+
+def ingest_statement(uid: str, contents: bytes, password: str = None, check_continuity: bool = True, summary_only: bool = False, progress=no_progress):
+    """Parse, extract and store one bank statement PDF for a user.
+
+    Blocking: call it from a worker thread, never from the event loop.
+    With summary_only the stored rows are not echoed back under "data".
+    """
+    progress("parsing", 5)
+    try:
+        # Lines stream page by page straight into the grouping logic
+        transaction_blocks = group_transactions_from_lines(iter_pdf_lines(contents, password=password))
+    except Exception as e:
+        raise StatementIngestionError(f"PDF extraction failed: {str(e)}")
+
+    #  Early check for continuity using extracted months
+    progress("checking_months", 20)
+    uploaded_months = extract_months_from_raw_blocks(transaction_blocks)
+
+    if not uploaded_months:
+        return {
+            "status": "error",
+            "reason": "no_months",
+            "warning": "No valid transaction months were detected from this statement. Please upload a valid or clearer PDF.",
+            "raw_months_detected": []
+        }
+
+    # Existing transaction months come from the per-user month ledger
+    existing_months = get_existing_months(uid)
+    duplicate_months = [m for m in uploaded_months if m in existing_months]
+
+    if duplicate_months:
+        return {
+            "status": "error",
+            "reason": "duplicate_months",
+            "warning": f"Duplicate month(s) detected: {', '.join(duplicate_months)}. You have already uploaded these.",
+            "raw_months_detected": uploaded_months
+        }
+
+    missing_months = find_missing_months(uploaded_months, existing_months) if check_continuity else []
+
+    if missing_months:
+        return {
+            "status": "error",
+            "reason": "missing_months",
+            "warning": f"Missing month(s): {', '.join(missing_months)}. Please upload them before proceeding.",
+            "raw_months_detected": uploaded_months
+        }
+
+    # Well-formed, categorisable lines are parsed locally; the rest go to Gemini
+    progress("extracting", 30)
+    fast_path = split_fast_path(transaction_blocks)
+
+    # Chunks go to Gemini in parallel and are merged back in statement order
+    extraction = extract_transactions_concurrently(fast_path["llm_blocks"], line_indices=fast_path["llm_line_indices"])
+    if extraction["failed_chunks"]:
+        # Storing a partial statement would mark its months as uploaded and lose the rest for good
+        raise ExtractionIncompleteError(
+            f"Transaction extraction failed for {len(extraction['failed_chunks'])} of "
+            f"{extraction['chunks']} chunk(s). Nothing was saved; please try again."
+        )
+    # Same-date rows keep their statement line order, whichever path parsed them
+    indexed = list(zip(fast_path["line_indices"], fast_path["transactions"]))
+    indexed += zip(extraction["line_indices"], extraction["transactions"])
+    transactions = [tx for _, tx in sorted(
+        indexed,
+        key=lambda pair: (str(pair[1].get("date", "")) if isinstance(pair[1], dict) else "", pair[0])
+    )]
+
+    # Load user's saved category learning, indexed once per upload
+    progress("storing", 75)
+    learning_ref = db.collection("users").document(uid).collection("category_learning")
+    learning_index = LearningIndex(build_learning_map(doc.to_dict() for doc in learning_ref.stream()))
+
+    # Process transactions, then store them in chunked batches
+    user_tx_ref = db.collection("users").document(uid).collection("transactions")
+    statement_id = str(uuid4())
+    writes = []
+    for tx in transactions:
+        if not tx or not isinstance(tx, dict):
+            continue
+        apply_learned_category(tx, learning_index)
+
+        tx["id"] = str(uuid4())
+        tx["user"] = uid
+        tx["statement_id"] = statement_id
+
+        writes.append((user_tx_ref.document(tx["id"]), tx))
+
+    transactions = [tx for _, tx in writes]
+    write_result = commit_in_batches(writes)
+    success_count = write_result["written"]
+
+    failed_ids = {doc_id for chunk in failed_chunks(write_result) for doc_id in chunk["doc_ids"]}
+    stored = [tx for tx in transactions if tx["id"] not in failed_ids]
+    uploaded_month_counts = record_months(uid, stored, statement_id)
+    apply_transactions(uid, stored)
+
+    progress("allocating_goals", 90)
+    # Savings come from the full monthly rollups, so a month split across statements is allocated once
+    reallocate_months(uid, uploaded_month_counts.keys())
+    bump_data_version(uid)
+
+    result = {
+        "message": f"{success_count} transactions uploaded",
+        "statement_id": statement_id,
+        "count": success_count,
+        "data": transactions,
+        "failed_chunks": failed_chunks(write_result),
+        "extraction": {
+            "chunks": extraction["chunks"],
+            "failed_chunks": extraction["failed_chunks"],
+            "fast_path": fast_path["stats"]
+        }
+    }
+    if summary_only:
+        del result["data"]
+    return result
@@ -0,0 +1,138 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from uuid import uuid4
+from fastapi import APIRouter, Request, HTTPException
+from firebase_config import db, verify_firebase_token
+from serialization import negotiated_response
+from dotenv import load_dotenv
+
+load_dotenv()
+
+router = APIRouter(tags=["Jobs"])
+
+INGESTION_WORKERS = int(os.getenv("INGESTION_WORKERS", "2"))
+JOB_STORE = os.getenv("JOB_STORE", "memory")  # "memory" or "firestore"
+MAX_FINISHED_JOBS = int(os.getenv("MAX_FINISHED_JOBS", "1000"))
+
+
+class InMemoryJobStore:
+    def __init__(self, max_finished: int = MAX_FINISHED_JOBS):
+        self.max_finished = max_finished
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def create(self, job: dict):
+        with self._lock:
+            self._jobs[job["id"]] = dict(job)
+            self._prune()
+
+    def update(self, job_id: str, **fields):
+        with self._lock:
+            if job_id in self._jobs:
+                self._jobs[job_id].update(fields)
+
+    def get(self, job_id: str, uid: str):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job and job["user"] == uid else None
+
+    def _prune(self):
+        # Oldest finished jobs go first once the store is full
+        finished = [j for j in self._jobs.values() if j["status"] in ("succeeded", "failed")]
+        for job in sorted(finished, key=lambda j: j["created_at"])[:max(0, len(finished) - self.max_finished)]:
+            del self._jobs[job["id"]]
+
+
+class FirestoreJobStore:
+    # Jobs live at users/{uid}/jobs/{job_id} so any worker process can answer polls
+    def __init__(self):
+        self._owners = {}
+
+    def _ref(self, uid: str, job_id: str):
+        return db.collection("users").document(uid).collection("jobs").document(job_id)
+
+    def create(self, job: dict):
+        self._owners[job["id"]] = job["user"]
+        self._ref(job["user"], job["id"]).set(job)
+
+    def update(self, job_id: str, **fields):
+        uid = self._owners.get(job_id)
+        if not uid:
+            return
+        if isinstance(fields.get("result"), dict):
+            # Keep the job document under Firestore's 1 MiB limit
+            fields["result"] = {k: v for k, v in fields["result"].items() if k != "data"}
+        if fields.get("status") in ("succeeded", "failed"):
+            self._owners.pop(job_id, None)
+        self._ref(uid, job_id).update(fields)
+
+    def get(self, job_id: str, uid: str):
+        # The document path is scoped by uid, so another user's job is never found
+        if not uid:
+            return None
+        doc = self._ref(uid, job_id).get()
+        job = doc.to_dict() if doc.exists else None
+        return job if job and job.get("user") == uid else None
+
+
+class JobQueue:
+    def __init__(self, store, max_workers: int = INGESTION_WORKERS):
+        self.store = store
+        self.executor = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="ingestion")
+
+    def submit(self, uid: str, kind: str, fn, *args, **kwargs) -> str:
+        job_id = str(uuid4())
+        self.store.create({
+            "id": job_id,
+            "user": uid,
+            "kind": kind,
+            "status": "queued",
+            "stage": "queued",
+            "progress": 0,
+            "result": None,
+            "error": None,
+            "created_at": datetime.utcnow().isoformat(),
+            "finished_at": None,
+        })
+        self.executor.submit(self._run, job_id, fn, args, kwargs)
+        return job_id
+
+    def _run(self, job_id: str, fn, args, kwargs):
+        def progress(stage: str, percent: int):
+            self.store.update(job_id, stage=stage, progress=percent)
+
+        self.store.update(job_id, status="running", stage="started")
+        try:
+            result = fn(*args, progress=progress, **kwargs)
+            self.store.update(
+                job_id,
+                status="succeeded",
+                stage="done",
+                progress=100,
+                result=result,
+                finished_at=datetime.utcnow().isoformat(),
+            )
+        except Exception as e:
+            self.store.update(
+                job_id,
+                status="failed",
+                error=str(e),
+                finished_at=datetime.utcnow().isoformat(),
+            )
+
+    def get(self, uid: str, job_id: str):
+        return self.store.get(job_id, uid)
+
+
+job_queue = JobQueue(FirestoreJobStore() if JOB_STORE == "firestore" else InMemoryJobStore())
+
+
+@router.get("/jobs/{job_id}")
+def get_job(job_id: str, request: Request):
+    uid = verify_firebase_token(request)
+    job = job_queue.get(uid, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return negotiated_response(request, job)
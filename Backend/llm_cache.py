@@ -0,0 +1,173 @@
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from dotenv import load_dotenv
+
+load_dotenv()
+
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+LLM_CACHE_DIR = os.getenv("LLM_CACHE_DIR")  # optional persistent backend
+
+
+def normalize_block(block: str) -> str:
+    return re.sub(r"\s+", " ", block).strip()
+
+
+def extraction_cache_key(transaction_blocks: list[str], prompt_version: str, model_name: str) -> str:
+    # A different model can extract differently, so it is part of the key like the prompt
+    digest = hashlib.sha256(f"{model_name}\n{prompt_version}".encode("utf-8"))
+    for block in transaction_blocks:
+        digest.update(b"\n")
+        digest.update(normalize_block(block).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class DiskCacheBackend:
+    """One JSON file per key, bounded like the in-memory LRU.
+
+    Reads bump a file's mtime, and once the directory holds more than
+    max_bytes the least recently used files are deleted.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = LLM_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._bytes = sum(size for _, _, size in self._files())
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _files(self):
+        files = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".json"):
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, entry.path, stat.st_size))
+        return files
+
+    def get(self, key: str):
+        try:
+            with open(self._path(key), "r", encoding="utf-8") as f:
+                payload = f.read()
+            os.utime(self._path(key))
+            return payload
+        except OSError:
+            return None
+
+    def set(self, key: str, payload: str):
+        # Write then rename so a crash never leaves a half-written entry
+        path = self._path(key)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(payload)
+        with self._lock:
+            previous = os.path.getsize(path) if os.path.exists(path) else 0
+            os.replace(tmp_path, path)
+            self._bytes += os.path.getsize(path) - previous
+            if self._bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        files = sorted(self._files())
+        self._bytes = sum(size for _, _, size in files)
+        for _, path, size in files:
+            if self._bytes <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                self._bytes -= size
+            except OSError:
+                continue
+
+
+class LLMResultCache:
+    """Size-bounded LRU of parsed LLM results, keyed by content hash.
+
+    Values are stored as JSON text so every hit hands back a fresh copy
+    that callers are free to mutate.
+    """
+
+    def __init__(self, max_bytes: int = LLM_CACHE_MAX_BYTES, backend=None):
+        self.max_bytes = max_bytes
+        self.backend = backend
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.backend_hits = 0
+        self.evictions = 0
+
+    def _store(self, key: str, payload: str):
+        size = len(payload.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._bytes -= self._entries.pop(key)[1]
+        self._entries[key] = (payload, size)
+        self._bytes += size
+        while self._bytes > self.max_bytes:
+            _, (_, evicted_size) = self._entries.popitem(last=False)
+            self._bytes -= evicted_size
+            self.evictions += 1
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return json.loads(entry[0])
+
+        payload = self.backend.get(key) if self.backend else None
+        with self._lock:
+            if payload is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.backend_hits += 1
+            self._store(key, payload)
+        return json.loads(payload)
+
+    def set(self, key: str, value):
+        payload = json.dumps(value, ensure_ascii=False)
+        with self._lock:
+            self._store(key, payload)
+        if self.backend:
+            try:
+                self.backend.set(key, payload)
+            except OSError:
+                pass
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "backend_hits": self.backend_hits,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups * 100, 1) if lookups else 0,
+                "persistent": self.backend is not None,
+            }
+
+
+extraction_cache = LLMResultCache(
+    backend=DiskCacheBackend(LLM_CACHE_DIR) if LLM_CACHE_DIR else None
+)
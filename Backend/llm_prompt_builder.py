@@ -1,17 +1,22 @@
 import os
 import json
+import random
 import re
+import hashlib
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dotenv import load_dotenv
 import google.generativeai as genai
+from llm_cache import extraction_cache, extraction_cache_key
 
 load_dotenv()
 
 genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
-model = genai.GenerativeModel("gemini-2.0-flash")
+EXTRACTION_MODEL = "gemini-2.0-flash"
+model = genai.GenerativeModel(EXTRACTION_MODEL)
 
 
-def build_prompt_with_rules(transaction_blocks: list[str]) -> str:
-    base_prompt = """
+BASE_PROMPT = """
 You are a personal finance assistant. Extract structured JSON transactions from bank statement lines.
 
 Each transaction must contain:
@@ -82,7 +87,14 @@ Output:
 }
 
 Now extract all transactions below and respond with a JSON array only:
-""" + "\n".join(transaction_blocks)
+"""
+
+# Changes to the prompt text invalidate cached extraction results
+PROMPT_VERSION = hashlib.sha256(BASE_PROMPT.encode("utf-8")).hexdigest()[:12]
+
+
+def build_prompt_with_rules(transaction_blocks: list[str]) -> str:
+    base_prompt = BASE_PROMPT + "\n".join(transaction_blocks)
     return base_prompt.strip()
 
 
@@ -98,40 +110,142 @@ def sanitize_json_text(text: str) -> str:
     return text
 
 
-def call_gemini_and_get_json(prompt: str):
-    try:
-        response = model.generate_content(prompt)
-        content = response.text.strip()
+class GeminiExtractionError(Exception):
+    pass
 
-        content = sanitize_json_text(content)
-        try:
-            parsed = json.loads(content)
-        except json.JSONDecodeError as e:
 
-            return []
+def parse_gemini_json(text: str):
+    content = sanitize_json_text(text.strip())
+    try:
+        parsed = json.loads(content)
+    except json.JSONDecodeError as e:
+        raise GeminiExtractionError(f"Gemini response was not valid JSON: {e}")
 
-        if isinstance(parsed, dict) and "transactions" in parsed:
-            return parsed["transactions"]
-        elif isinstance(parsed, list):
-            return parsed
-        else:
+    if isinstance(parsed, dict) and "transactions" in parsed:
+        return parsed["transactions"]
+    elif isinstance(parsed, list):
+        return parsed
+    raise GeminiExtractionError("Gemini response was not a JSON array of transactions")
 
-            return []
 
+def generate_transactions_json(prompt: str):
+    try:
+        response = model.generate_content(prompt)
+        text = response.text
     except Exception as e:
+        raise GeminiExtractionError(f"Gemini request failed: {e}")
+    return parse_gemini_json(text)
+
 
+def call_gemini_and_get_json(prompt: str):
+    try:
+        return generate_transactions_json(prompt)
+    except GeminiExtractionError:
         return []
 
 
-def chunk_transactions(transactions: list[str], chunk_size: int = 20):
-    for i in range(0, len(transactions), chunk_size):
-        yield transactions[i:i + chunk_size]
+# Chunking and concurrency are tunable per deployment
+GEMINI_CHUNK_TOKENS = int(os.getenv("GEMINI_CHUNK_TOKENS", "4000"))
+GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "4"))
+GEMINI_CHUNK_RETRIES = int(os.getenv("GEMINI_CHUNK_RETRIES", "2"))
+GEMINI_RETRY_BASE_SECONDS = float(os.getenv("GEMINI_RETRY_BASE_SECONDS", "1"))
+GEMINI_RETRY_MAX_SECONDS = float(os.getenv("GEMINI_RETRY_MAX_SECONDS", "20"))
+
+
+def estimate_tokens(text: str) -> int:
+    # Rough Gemini estimate: ~4 characters per token
+    return len(text) // 4 + 1
+
+
+def chunk_transactions(transactions: list[str], max_tokens: int = GEMINI_CHUNK_TOKENS):
+    chunk, chunk_tokens = [], 0
+    for block in transactions:
+        block_tokens = estimate_tokens(block)
+        if chunk and chunk_tokens + block_tokens > max_tokens:
+            yield chunk
+            chunk, chunk_tokens = [], 0
+        chunk.append(block)
+        chunk_tokens += block_tokens
+    if chunk:
+        yield chunk
+
+
+def retry_delay(attempt: int) -> float:
+    # Full jitter, so chunks that failed together do not hit the rate limit together again
+    return random.uniform(0, min(GEMINI_RETRY_MAX_SECONDS, GEMINI_RETRY_BASE_SECONDS * 2 ** attempt))
+
+
+def extract_chunk(chunk: list[str]):
+    key = extraction_cache_key(chunk, PROMPT_VERSION, EXTRACTION_MODEL)
+    cached = extraction_cache.get(key)
+    if cached is not None:
+        return cached
+
+    results = generate_transactions_json(build_prompt_with_rules(chunk))
+    # An empty answer may be a transient model hiccup; never pin it for this content
+    if results:
+        extraction_cache.set(key, results)
+    return results
+
+
+def extract_transactions_concurrently(
+    transaction_lines: list[str],
+    max_tokens: int = GEMINI_CHUNK_TOKENS,
+    max_workers: int = GEMINI_MAX_CONCURRENCY,
+    max_retries: int = GEMINI_CHUNK_RETRIES,
+    line_indices: list[int] = None,
+):
+    chunks = list(chunk_transactions(transaction_lines, max_tokens))
+    results = [None] * len(chunks)
+    errors = {}
+
+    pending = list(range(len(chunks)))
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        for attempt in range(max_retries + 1):
+            if not pending:
+                break
+            if attempt:
+                time.sleep(retry_delay(attempt - 1))
+            futures = {executor.submit(extract_chunk, chunks[i]): i for i in pending}
+            pending = []
+            for future in as_completed(futures):
+                i = futures[future]
+                try:
+                    results[i] = future.result()
+                    errors.pop(i, None)
+                except GeminiExtractionError as e:
+                    errors[i] = str(e)
+                    pending.append(i)
+            # Only failed chunks go around again
+            pending.sort()
+
+    # Merge back in statement order
+    if line_indices is None:
+        line_indices = list(range(len(transaction_lines)))
+    transactions, merged_line_indices = [], []
+    start = 0
+    for chunk, chunk_result in zip(chunks, results):
+        chunk_indices = line_indices[start:start + len(chunk)]
+        start += len(chunk)
+        if not chunk_result:
+            continue
+        transactions.extend(chunk_result)
+        if len(chunk_result) == len(chunk):
+            # One row per block: each row keeps its own block's position
+            merged_line_indices.extend(chunk_indices)
+        else:
+            merged_line_indices.extend([chunk_indices[0]] * len(chunk_result))
+
+    return {
+        "transactions": transactions,
+        "line_indices": merged_line_indices,
+        "chunks": len(chunks),
+        "failed_chunks": [
+            {"chunk": i, "lines": len(chunks[i]), "error": errors[i]}
+            for i in sorted(errors)
+        ],
+    }
 
 
 def extract_all_transactions(transaction_lines: list[str]):
-    all_results = []
-    for chunk in chunk_transactions(transaction_lines):
-        prompt = build_prompt_with_rules(chunk)
-        results = call_gemini_and_get_json(prompt)
-        all_results.extend(results)
-    return all_results
+    return extract_transactions_concurrently(transaction_lines)["transactions"]
@@ -0,0 +1,17 @@
+from fastapi import APIRouter, Request
+from firebase_config import verify_firebase_token
+from llm_cache import extraction_cache
+from response_cache import response_cache
+from financial_advice import stream_timing_stats
+
+router = APIRouter(prefix="/metrics", tags=["Metrics"])
+
+
+@router.get("/cache")
+def get_cache_metrics(request: Request):
+    verify_firebase_token(request)
+    return {
+        "llm_extraction": extraction_cache.stats(),
+        "responses": response_cache.stats(),
+        "advice_streaming": stream_timing_stats(),
+    }
@@ -0,0 +1,82 @@
+from collections import Counter, defaultdict
+from datetime import datetime
+from firebase_admin import firestore
+from firebase_config import db
+from transaction_reads import stream_transactions, MONTH_FIELDS
+
+# users/{uid}/ledger/months:
+# {"months": {"2024-06": {"count": 42, "statements": ["<statement_id>", ...]}}}
+
+
+def month_ledger_ref(uid: str):
+    return db.collection("users").document(uid).collection("ledger").document("months")
+
+
+def month_of(tx):
+    try:
+        return datetime.strptime(tx["date"], "%Y-%m-%d").strftime("%Y-%m")
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def build_month_ledger(transactions):
+    months = defaultdict(lambda: {"count": 0, "statements": set()})
+    for tx in transactions:
+        month = month_of(tx)
+        if not month:
+            continue
+        months[month]["count"] += 1
+        if tx.get("statement_id"):
+            months[month]["statements"].add(tx["statement_id"])
+
+    return {
+        month: {"count": entry["count"], "statements": sorted(entry["statements"])}
+        for month, entry in months.items()
+    }
+
+
+def backfill_month_ledger(uid: str):
+    months = build_month_ledger(stream_transactions(uid, MONTH_FIELDS))
+    month_ledger_ref(uid).set({
+        "months": months,
+        "updated_at": datetime.utcnow().isoformat(),
+    })
+    return months
+
+
+def get_existing_months(uid: str) -> set:
+    doc = month_ledger_ref(uid).get()
+    if doc.exists:
+        return set((doc.to_dict().get("months") or {}).keys())
+
+    # Users that predate the ledger get it built on first upload
+    return set(backfill_month_ledger(uid).keys())
+
+
+def record_months(uid: str, transactions, statement_id: str):
+    counts = Counter(m for m in (month_of(tx) for tx in transactions) if m)
+    if not counts:
+        return {}
+
+    month_ledger_ref(uid).set({
+        "months": {
+            month: {
+                "count": firestore.Increment(count),
+                "statements": firestore.ArrayUnion([statement_id]),
+            }
+            for month, count in counts.items()
+        },
+        "updated_at": datetime.utcnow().isoformat(),
+    }, merge=True)
+    return dict(counts)
+
+
+def backfill_all_users():
+    for user_ref in db.collection("users").list_documents():
+        months = backfill_month_ledger(user_ref.id)
+        print(f"{user_ref.id}: {len(months)} month(s)")
+
+
+if __name__ == "__main__":
+    # One-off: python month_ledger.py
+    backfill_all_users()
@@ -2,6 +2,7 @@ from fastapi import APIRouter, Request, HTTPException
 from firebase_admin import auth, firestore
 from typing import List
 from firebase_config import verify_firebase_token
+from response_cache import conditional_response
 router = APIRouter()
 
 
@@ -33,5 +34,7 @@ def get_pending_review_transactions(uid: str) -> List[dict]:
 @router.get("/transactions/pending-review")
 def fetch_pending_review_transactions(request: Request):
     uid = verify_firebase_token(request)
-    transactions = get_pending_review_transactions(uid)
-    return {"transactions": transactions}
+    return conditional_response(
+        request, uid, "pending-review", {},
+        lambda: {"transactions": get_pending_review_transactions(uid)},
+    )
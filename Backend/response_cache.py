@@ -0,0 +1,103 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from dotenv import load_dotenv
+from fastapi import Request, Response
+from data_version import get_data_version
+from serialization import negotiated_response
+
+load_dotenv()
+
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "2048"))
+
+
+class ResponseCache:
+    """Bounded LRU of computed responses keyed by (uid, endpoint, params, version).
+
+    A write bumps the user's data version, so older entries can never be
+    served again; they simply age out of the LRU.
+    """
+
+    def __init__(self, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+            return None
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups * 100, 1) if lookups else 0,
+            }
+
+
+response_cache = ResponseCache()
+
+
+def cached_response(uid: str, endpoint: str, params: dict, compute, version=None):
+    if version is None:
+        version = get_data_version(uid)
+    key = (uid, endpoint, tuple(sorted(params.items())), version)
+    response = response_cache.get(key)
+    if response is None:
+        response = compute()
+        response_cache.set(key, response)
+    return response
+
+
+def response_etag(uid: str, endpoint: str, params: dict, version) -> str:
+    # Same inputs as the cache key, so a strong ETag holds until the next write
+    key = (uid, endpoint, tuple(sorted(params.items())), version)
+    return '"' + hashlib.sha256(repr(key).encode("utf-8")).hexdigest()[:24] + '"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    tags = {tag.strip() for tag in header.split(",")}
+    return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+
+def conditional_response(request: Request, uid: str, endpoint: str, params: dict, compute, cache: bool = True, version=None):
+    """Serve compute() with an ETag, or a bare 304 if the client already has it.
+
+    Only the user's data version is read before deciding, so an unchanged
+    poll skips the endpoint's queries and serialisation entirely. Endpoints
+    with their own versioning pass version instead.
+    """
+    if version is None:
+        version = get_data_version(uid)
+    etag = response_etag(uid, endpoint, params, version)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache", "Vary": "Accept"}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+
+    body = cached_response(uid, endpoint, params, compute, version) if cache else compute()
+    return negotiated_response(request, body, headers=headers)
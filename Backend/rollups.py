@@ -0,0 +1,241 @@
+import sys
+from datetime import datetime, date
+from dateutil.relativedelta import relativedelta
+from firebase_admin import firestore
+from firebase_config import db
+from analytics import TransactionColumns
+from batch_writer import commit_in_batches
+from transaction_reads import stream_transactions, ROLLUP_FIELDS
+
+# users/{uid}/monthly_rollups/{YYYY-MM}:
+# {"month", "credit_total", "debit_total", "count",
+#  "categories": {cat: {"credit", "debit", "count"}},
+#  "largest_debits": [{"id", "title", "amount", "category", "date"}, ...]}
+LARGEST_DEBITS_KEPT = 3
+
+
+def rollups_ref(uid: str):
+    return db.collection("users").document(uid).collection("monthly_rollups")
+
+
+def rollups_state_ref(uid: str):
+    return db.collection("users").document(uid).collection("ledger").document("rollups")
+
+
+def empty_rollup(month: str = None) -> dict:
+    return {
+        "month": month,
+        "credit_total": 0.0,
+        "debit_total": 0.0,
+        "count": 0,
+        "categories": {},
+        "largest_debits": [],
+    }
+
+
+def normalize_transaction(tx):
+    try:
+        month = datetime.strptime(tx["date"], "%Y-%m-%d").strftime("%Y-%m")
+        amount = float(tx["amount"])
+    except (KeyError, TypeError, ValueError):
+        return None
+    tx_type = str(tx.get("type", "")).strip().lower()
+    return month, tx_type, tx.get("category", "Others"), amount
+
+
+def keep_largest(debits):
+    return sorted(debits, key=lambda d: d["amount"], reverse=True)[:LARGEST_DEBITS_KEPT]
+
+
+def add_transaction(rollup: dict, tx: dict, sign: int = 1, track_largest: bool = True):
+    normalized = normalize_transaction(tx)
+    if not normalized:
+        return
+    _, tx_type, category, amount = normalized
+
+    rollup["count"] += sign
+    cat = rollup["categories"].setdefault(category, {"credit": 0.0, "debit": 0.0, "count": 0})
+    cat["count"] += sign
+    if tx_type in ("credit", "debit"):
+        rollup[f"{tx_type}_total"] += sign * amount
+        cat[tx_type] += sign * amount
+
+    if tx_type == "debit" and sign > 0 and track_largest:
+        rollup["largest_debits"] = keep_largest(rollup["largest_debits"] + [{
+            "id": tx.get("id"),
+            "title": tx.get("title", "N/A"),
+            "amount": amount,
+            "category": category,
+            "date": tx["date"],
+        }])
+
+
+def merge_rollup(base: dict, delta: dict) -> dict:
+    base["credit_total"] += delta["credit_total"]
+    base["debit_total"] += delta["debit_total"]
+    base["count"] += delta["count"]
+    for category, totals in delta["categories"].items():
+        cat = base["categories"].setdefault(category, {"credit": 0.0, "debit": 0.0, "count": 0})
+        for field in ("credit", "debit", "count"):
+            cat[field] += totals[field]
+    base["largest_debits"] = keep_largest(base["largest_debits"] + delta["largest_debits"])
+    return base
+
+
+def build_rollups(transactions) -> dict:
+    return TransactionColumns.from_records(transactions).rollups(LARGEST_DEBITS_KEPT)
+
+
+@firestore.transactional
+def _merge_month(transaction, ref, delta):
+    snapshot = ref.get(transaction=transaction)
+    current = snapshot.to_dict() if snapshot.exists else empty_rollup(delta["month"])
+    merged = merge_rollup(current, delta)
+    merged["updated_at"] = datetime.utcnow().isoformat()
+    transaction.set(ref, merged)
+
+
+def rollups_ready(uid: str) -> bool:
+    doc = rollups_state_ref(uid).get()
+    return doc.exists and doc.to_dict().get("built", False)
+
+
+def ensure_rollups(uid: str):
+    # Users that predate rollups get theirs built from raw data on first use
+    if not rollups_ready(uid):
+        rebuild_rollups(uid)
+
+
+def apply_transactions(uid: str, transactions):
+    """Fold newly stored transactions into their monthly rollups."""
+    if not rollups_ready(uid):
+        # The rebuild reads raw data, which already includes these transactions
+        rebuild_rollups(uid)
+        return
+
+    for month, delta in build_rollups(transactions).items():
+        _merge_month(db.transaction(), rollups_ref(uid).document(month), delta)
+
+
+@firestore.transactional
+def _move_category(transaction, ref, tx, old_category, new_category):
+    snapshot = ref.get(transaction=transaction)
+    if not snapshot.exists:
+        return
+    rollup = snapshot.to_dict()
+
+    add_transaction(rollup, dict(tx, category=old_category), sign=-1, track_largest=False)
+    add_transaction(rollup, dict(tx, category=new_category), sign=1, track_largest=False)
+
+    for entry in rollup["largest_debits"]:
+        if entry.get("id") == tx.get("id"):
+            entry["category"] = new_category
+    rollup["updated_at"] = datetime.utcnow().isoformat()
+    transaction.set(ref, rollup)
+
+
+def recategorize_transaction(uid: str, tx: dict, old_category: str, new_category: str):
+    normalized = normalize_transaction(tx)
+    if not normalized or old_category == new_category or not rollups_ready(uid):
+        return
+    _move_category(db.transaction(), rollups_ref(uid).document(normalized[0]), tx, old_category, new_category)
+
+
+def rebuild_rollups(uid: str, check_only: bool = False) -> dict:
+    """Regenerate a user's rollups from raw transactions.
+
+    Returns the months whose stored rollup disagreed with the raw data.
+    """
+    fresh = build_rollups(stream_transactions(uid, ROLLUP_FIELDS))
+    stored = {doc.id: doc.to_dict() for doc in rollups_ref(uid).stream()}
+
+    mismatched = {}
+    for month in sorted(set(fresh) | set(stored)):
+        expected = fresh.get(month, empty_rollup(month))
+        actual = stored.get(month, empty_rollup(month))
+        for field in ("credit_total", "debit_total", "count"):
+            if round(expected[field], 2) != round(actual.get(field, 0), 2):
+                mismatched.setdefault(month, {})[field] = {"stored": actual.get(field, 0), "raw": expected[field]}
+
+    if check_only:
+        return mismatched
+
+    now = datetime.utcnow().isoformat()
+    writes = [(rollups_ref(uid).document(month), None) for month in stored.keys() - fresh.keys()]
+    writes += [(rollups_ref(uid).document(month), rollup | {"updated_at": now}) for month, rollup in fresh.items()]
+    result = commit_in_batches(writes)
+    if result["failed"]:
+        # Without the built marker the next read rebuilds again instead of trusting partial rollups
+        raise RuntimeError(f"Rollup rebuild for {uid} failed to store {result['failed']} month(s)")
+    rollups_state_ref(uid).set({"built": True, "rebuilt_at": now})
+    return mismatched
+
+
+def load_rollups(uid: str) -> dict:
+    ensure_rollups(uid)
+    return {doc.id: doc.to_dict() for doc in rollups_ref(uid).stream()}
+
+
+def month_bounds(month_start: date):
+    return month_start, month_start + relativedelta(months=1)
+
+
+class RollupWindows:
+    """Window aggregates from monthly rollups.
+
+    Whole months inside a window come straight from their rollup. Only the
+    partial months at a window's edges are read as raw rows, each month at
+    most once.
+    """
+
+    def __init__(self, rollups: dict, fetch_rows):
+        self.rollups = rollups
+        self.fetch_rows = fetch_rows  # (start, end) -> list of transaction dicts
+        self._month_rows = {}
+
+    def _rows_for_month(self, month_start: date):
+        key = month_start.strftime("%Y-%m")
+        if key not in self._month_rows:
+            self._month_rows[key] = self.fetch_rows(*month_bounds(month_start))
+        return self._month_rows[key]
+
+    def aggregate(self, start: date, end: date) -> dict:
+        result = empty_rollup()
+        month_start = start.replace(day=1)
+        while month_start < end:
+            _, month_end = month_bounds(month_start)
+            key = month_start.strftime("%Y-%m")
+            if start <= month_start and month_end <= end:
+                if key in self.rollups:
+                    merge_rollup(result, self.rollups[key])
+            else:
+                rows = [
+                    t for t in self._rows_for_month(month_start)
+                    if str(start) <= str(t.get("date", "")) < str(end)
+                ]
+                for rollup in build_rollups(rows).values():
+                    merge_rollup(result, rollup)
+            month_start = month_end
+        return result
+
+
+def monthly_savings_from_rollups(rollups: dict) -> dict:
+    # Salary in (either type) minus every non-salary debit, per month
+    savings = {}
+    for month, rollup in rollups.items():
+        salary = rollup["categories"].get("Salary", {})
+        salary_in = salary.get("credit", 0) + salary.get("debit", 0)
+        other_debits = rollup["debit_total"] - salary.get("debit", 0)
+        savings[month] = salary_in - other_debits
+    return savings
+
+
+if __name__ == "__main__":
+    # python rollups.py [--check] [uid ...]; no uids means every user
+    args = sys.argv[1:]
+    check = "--check" in args
+    uids = [a for a in args if a != "--check"] or [ref.id for ref in db.collection("users").list_documents()]
+    for uid in uids:
+        mismatched = rebuild_rollups(uid, check_only=check)
+        status = "consistent" if not mismatched else f"{len(mismatched)} month(s) differed: {mismatched}"
+        print(f"{uid}: {status}")
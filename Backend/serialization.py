@@ -0,0 +1,62 @@
+from datetime import date, datetime
+import msgpack
+import numpy as np
+import orjson
+from fastapi import Request
+from fastapi.responses import Response
+
+MSGPACK_MEDIA_TYPES = ("application/msgpack", "application/x-msgpack")
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+
+def encode_fallback(value):
+    # Firestore timestamps are datetime subclasses; anything else unknown becomes a string
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, (set, frozenset, tuple)):
+        return list(value)
+    return str(value)
+
+
+def dumps_json(content) -> bytes:
+    return orjson.dumps(content, default=encode_fallback, option=ORJSON_OPTIONS)
+
+
+def dumps_msgpack(content) -> bytes:
+    return msgpack.packb(content, default=encode_fallback, use_bin_type=True)
+
+
+class FastJSONResponse(Response):
+    """orjson-backed JSON response; the app's default response class."""
+
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return dumps_json(content)
+
+
+class MsgPackResponse(Response):
+    media_type = "application/msgpack"
+
+    def render(self, content) -> bytes:
+        return dumps_msgpack(content)
+
+
+def wants_msgpack(request: Request) -> bool:
+    accept = request.headers.get("accept", "").lower()
+    return any(media_type in accept for media_type in MSGPACK_MEDIA_TYPES)
+
+
+def negotiated_response(request: Request, content, status_code: int = 200, headers: dict = None):
+    """MessagePack when the client's Accept header asks for it, JSON otherwise.
+
+    Returning the Response directly also skips FastAPI's jsonable_encoder
+    pass, which dominates the cost of large transaction lists.
+    """
+    headers = {**(headers or {}), "Vary": "Accept"}
+    response_class = MsgPackResponse if wants_msgpack(request) else FastJSONResponse
+    return response_class(content, status_code=status_code, headers=headers)
@@ -0,0 +1,32 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from category_learning import LearningIndex, apply_learned_category, build_learning_map
+
+
+def learning_index():
+    return LearningIndex(build_learning_map([
+        {"title": "Zomato", "amount": 450, "category": "Dining"},
+    ]))
+
+
+def test_learned_category_overrides_matching_row():
+    tx = apply_learned_category({"title": "ZOMATO ", "amount": 455.0, "category": "Others"}, learning_index())
+    assert tx["category"] == "Dining"
+    assert tx["confidence"] == 100
+    assert tx["category_overridden_by_learning"] is True
+
+
+def test_null_title_row_is_kept_unmatched():
+    tx = {"title": None, "amount": 450, "category": "Others", "date": "2024-01-05"}
+    assert apply_learned_category(tx, learning_index()) is tx
+    assert tx["category"] == "Others"
+    assert tx["category_overridden_by_learning"] is False
+
+
+def test_null_amount_row_is_kept_unmatched():
+    tx = apply_learned_category({"title": "Zomato", "amount": None, "category": "Others"}, learning_index())
+    assert tx["category"] == "Others"
+    assert tx["category_overridden_by_learning"] is False
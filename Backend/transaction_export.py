@@ -0,0 +1,62 @@
+import csv
+import io
+import json
+import zlib
+from datetime import datetime
+from fastapi import APIRouter, Request, Query, HTTPException
+from fastapi.responses import StreamingResponse
+from firebase_config import verify_firebase_token
+from transaction_reads import iter_transaction_pages
+
+router = APIRouter(tags=["Export"])
+
+EXPORT_PAGE_SIZE = 500
+CSV_COLUMNS = ["id", "date", "title", "amount", "type", "category", "payment_method", "description", "confidence"]
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+def ndjson_rows(pages):
+    for page in pages:
+        yield "".join(json.dumps(tx, ensure_ascii=False, default=str) + "\n" for tx in page).encode("utf-8")
+
+
+def csv_rows(pages):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=CSV_COLUMNS, extrasaction="ignore")
+    writer.writeheader()
+    for page in pages:
+        writer.writerows(page)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate(0)
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+def gzip_stream(chunks):
+    compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+@router.get("/transactions/export")
+def export_transactions(request: Request, format: str = Query("ndjson")):
+    uid = verify_firebase_token(request)
+    format = format.strip().lower()
+    if format not in MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail="format must be ndjson or csv")
+
+    pages = iter_transaction_pages(uid, EXPORT_PAGE_SIZE)
+    body = ndjson_rows(pages) if format == "ndjson" else csv_rows(pages)
+
+    filename = f"transactions-{datetime.utcnow().strftime('%Y%m%d')}.{format}"
+    headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
+    if "gzip" in request.headers.get("accept-encoding", "").lower():
+        body = gzip_stream(body)
+        headers["Content-Encoding"] = "gzip"
+        headers["Vary"] = "Accept-Encoding"
+
+    return StreamingResponse(body, media_type=MEDIA_TYPES[format], headers=headers)
@@ -0,0 +1,107 @@
+import base64
+from firebase_admin import firestore
+from google.cloud.firestore_v1.field_path import FieldPath
+from firebase_config import db
+
+# Fields each read path actually needs; everything else stays on the server
+ROLLUP_FIELDS = ["date", "amount", "type", "category", "id", "title"]
+MONTH_FIELDS = ["date", "statement_id"]
+CONTRIBUTION_FIELDS = ["goal_id", "allocated"]
+GOAL_ALLOCATION_FIELDS = ["created_at", "manual_allocated", "target_amount"]
+
+
+def transactions_ref(uid: str):
+    return db.collection("users").document(uid).collection("transactions")
+
+
+def stream_transactions(uid: str, fields=None, start=None, end=None):
+    """Stream a user's transactions as dicts, optionally projected and date-bounded."""
+    query = transactions_ref(uid)
+    if start is not None:
+        query = query.where("date", ">=", str(start))
+    if end is not None:
+        query = query.where("date", "<", str(end))
+    if fields:
+        query = query.select(fields)
+    for doc in query.stream():
+        yield doc.to_dict()
+
+
+def encode_cursor(doc_id: str) -> str:
+    return base64.urlsafe_b64encode(doc_id.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> str:
+    try:
+        return base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("utf-8")
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError("Invalid cursor")
+
+
+def fetch_transactions_page(
+    uid: str,
+    limit: int,
+    cursor: str = None,
+    start_date: str = None,
+    end_date: str = None,
+    category: str = None,
+    tx_type: str = None,
+    min_amount: float = None,
+    max_amount: float = None,
+):
+    """One page of a user's transactions, newest first.
+
+    Every filter runs in Firestore; see firestore.indexes.json for the
+    composite indexes the combinations need.
+    """
+    query = transactions_ref(uid)
+    if category:
+        query = query.where("category", "==", category)
+    if tx_type:
+        query = query.where("type", "==", tx_type)
+    if start_date:
+        query = query.where("date", ">=", start_date)
+    if end_date:
+        query = query.where("date", "<=", end_date)
+    if min_amount is not None:
+        query = query.where("amount", ">=", min_amount)
+    if max_amount is not None:
+        query = query.where("amount", "<=", max_amount)
+
+    query = query.order_by("date", direction=firestore.Query.DESCENDING) \
+        .order_by(FieldPath.document_id(), direction=firestore.Query.DESCENDING)
+
+    if cursor:
+        last_doc = transactions_ref(uid).document(decode_cursor(cursor)).get()
+        if not last_doc.exists:
+            raise ValueError("Invalid cursor")
+        query = query.start_after(last_doc)
+
+    # One extra row tells us whether another page exists
+    docs = list(query.limit(limit + 1).stream())
+    page = docs[:limit]
+    next_cursor = encode_cursor(page[-1].id) if len(docs) > limit else None
+    return [doc.to_dict() for doc in page], next_cursor
+
+
+def iter_transaction_pages(uid: str, page_size: int = 500, fields=None):
+    """Yield a user's transactions page by page, oldest first.
+
+    Each page resumes after the previous page's last snapshot, so memory
+    stays at one page however long the history is.
+    """
+    query = transactions_ref(uid)
+    if fields:
+        query = query.select(fields)
+    query = query.order_by("date").order_by(FieldPath.document_id()).limit(page_size)
+
+    last_doc = None
+    while True:
+        page_query = query.start_after(last_doc) if last_doc else query
+        docs = list(page_query.stream())
+        if not docs:
+            return
+        yield [doc.to_dict() for doc in docs]
+        if len(docs) < page_size:
+            return
+        last_doc = docs[-1]
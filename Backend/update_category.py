@@ -1,6 +1,8 @@
 from fastapi import APIRouter, Request, HTTPException
 from pydantic import BaseModel
 from firebase_admin import auth, firestore
+from rollups import recategorize_transaction
+from data_version import bump_data_version
 
 router = APIRouter()
 #  Verify Firebase token
@@ -32,11 +34,19 @@ def update_transaction_category(request: Request, body: UpdateCategoryRequest):
 
     #  Update category of the transaction
     tx_ref = db.collection("users").document(uid).collection("transactions").document(body.transaction_id)
+    tx_doc = tx_ref.get()
+    if not tx_doc.exists:
+        raise HTTPException(status_code=404, detail="Transaction not found")
+    tx = tx_doc.to_dict()
+
     tx_ref.update({
         "category": body.new_category,
         "category_updated_manually": True
     })
 
+    # Move the amount between categories in the month's rollup
+    recategorize_transaction(uid, tx | {"id": body.transaction_id}, tx.get("category", "Others"), body.new_category)
+
     # Save user-specific learning
     learn_ref = db.collection("users").document(uid).collection("category_learning")
     learn_doc_id = f"{body.title.lower().strip()}_{int(body.amount)}" 
@@ -48,4 +58,5 @@ def update_transaction_category(request: Request, body: UpdateCategoryRequest):
         "updated_at": firestore.SERVER_TIMESTAMP,
     })
 
+    bump_data_version(uid)
     return {"success": True, "message": "Category updated and learning saved."}
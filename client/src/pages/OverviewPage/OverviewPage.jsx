@@ -188,7 +188,7 @@ const OverviewPage = () => {
         return;
       }
 
-      toast.success(`${result.data.length} transactions uploaded`);
+      toast.success(`${result.count} transactions uploaded`);
       setShowConfetti(true);
       setTimeout(() => setShowConfetti(false), 4000);
 
@@ -18,6 +18,7 @@ export async function uploadBankStatement(
   formData.append("file", file);
   formData.append("password", password);
   formData.append("check_continuity", checkContinuity.toString()); 
+  formData.append("summary", "true");
 
   const response = await fetch(`${API_BASE}/upload-bank-statement-cot`, {
     method: "POST",
@@ -32,7 +33,33 @@ export async function uploadBankStatement(
     throw new Error(data.detail || "Failed to upload");
   }
 
-  return data;
+  // Ingestion runs as a background job on the server; wait for its result
+  const job = await waitForJob(data.job_id, idToken);
+  if (job.status === "failed") {
+    throw new Error(job.error || "Failed to upload");
+  }
+
+  return job.result;
+}
+
+export async function waitForJob(jobId, idToken, intervalMs = 1500) {
+  for (;;) {
+    const res = await fetch(`${API_BASE}/jobs/${jobId}`, {
+      headers: {
+        Authorization: `Bearer ${idToken}`,
+      },
+    });
+
+    const job = await res.json();
+    if (!res.ok) {
+      throw new Error(job.detail || "Failed to fetch upload status");
+    }
+    if (job.status === "succeeded" || job.status === "failed") {
+      return job;
+    }
+
+    await new Promise((resolve) => setTimeout(resolve, intervalMs));
+  }
 }
 
 export async function fetchTransactions() {
@@ -43,20 +70,32 @@ export async function fetchTransactions() {
   if (!user) throw new Error("User not authenticated");
 
   const idToken = await user.getIdToken();
-  const res = await fetch(`${API_BASE}/transactions`, {
-    method: "GET",
-    headers: {
-      Authorization: `Bearer ${idToken}`,
-    },
-  });
 
-  if (!res.ok) {
-    const error = await res.json();
-    throw new Error(error.detail || "Failed to fetch transactions");
-  }
+  // The endpoint is cursor-paginated; follow next_cursor until the last page
+  const transactions = [];
+  let cursor = null;
+  do {
+    const params = new URLSearchParams({ limit: "500" });
+    if (cursor) params.set("cursor", cursor);
 
-  const data = await res.json();
-  return data.transactions; 
+    const res = await fetch(`${API_BASE}/transactions?${params.toString()}`, {
+      method: "GET",
+      headers: {
+        Authorization: `Bearer ${idToken}`,
+      },
+    });
+
+    if (!res.ok) {
+      const error = await res.json();
+      throw new Error(error.detail || "Failed to fetch transactions");
+    }
+
+    const data = await res.json();
+    transactions.push(...data.transactions);
+    cursor = data.next_cursor;
+  } while (cursor);
+
+  return transactions;
 }
 
 